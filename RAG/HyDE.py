@@ -1,13 +1,20 @@
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, TimeoutError
 from pathlib import Path
-from langchain_community.document_loaders import PyPDFLoader
-from langchain_text_splitters import RecursiveCharacterTextSplitter
+import numpy as np
 from langchain_openai import OpenAIEmbeddings
-from langchain_qdrant import QdrantVectorStore
 from openai import OpenAI
 from dotenv import load_dotenv
-import json
 import os
 from typing import List
+from ingestion import stream_pdf_into_qdrant
+from embedding_cache import CachedEmbeddings
+from llm_cache import cached_completion, init_llm_cache
+from retrievers import get_vector_store
+from context_builder import DEFAULT_CONTEXT_TOKENS, build_context
+from answering import answer_from_context
+from fusion import chunk_key, fuse
 
 
 def init_clients():
@@ -15,57 +22,46 @@ def init_clients():
     load_dotenv()
     openai_api_key = os.getenv("OPENAI_API_KEY")
     client = OpenAI()
-    embeddings = OpenAIEmbeddings(
-        model="text-embedding-3-large", api_key=openai_api_key
+    embeddings = CachedEmbeddings(
+        OpenAIEmbeddings(model="text-embedding-3-large", api_key=openai_api_key)
     )
+    init_llm_cache(embeddings)
     print("clients ready!")
     return client, embeddings
 
 
 def inject_pdf(pdf_path, embeddings):
     print("injecting pdf..")
-    loader = PyPDFLoader(file_path=pdf_path)
 
-    docs = loader.load()
-
-    text_splitter = RecursiveCharacterTextSplitter(
-        chunk_size=1000,
-        chunk_overlap=200,
-    )
-
-    split_docs = text_splitter.split_documents(documents=docs)
-
-    vector_store = QdrantVectorStore.from_documents(
-        documents=[],
-        url="http://localhost:6333",
+    stream_pdf_into_qdrant(
+        pdf_path,
+        embeddings,
         collection_name="parallel_query",
-        embedding=embeddings,
+        url="http://localhost:6333",
     )
 
-    vector_store.add_documents(documents=split_docs)
-
     print("PDF Injection Compelete!")
 
 
-def llm(client, user_query):
-
-    SYSTEM_PROMPT = """
+HYDE_PROMPT = """
     You are a helpful assistant. 
     Generate a concise passage (2–3 sentences) that could hypothetically answer the user query, 
     as if it came from a textbook or reference guide. 
     Do not say 'I don’t know'. Just generate the most plausible answer passage.
     """
 
-    res = client.chat.completions.create(
+
+def llm(client, user_query):
+
+    answer = cached_completion(
+        client,
         model="gpt-4o-mini",
         messages=[
-            {"role": "system", "content": SYSTEM_PROMPT},
+            {"role": "system", "content": HYDE_PROMPT},
             {"role": "user", "content": user_query},
         ],
     )
 
-    answer = res.choices[0].message.content
-
     print(f"Query: {user_query}")
     print("Answer: ", answer)
 
@@ -79,7 +75,8 @@ def rewrite_query(client, user_query):
     Take the user query and rewrite it
     """
 
-    res = client.chat.completions.create(
+    rewrites = cached_completion(
+        client,
         model="gpt-4o-mini",
         messages=[
             {"role": "system", "content": SYSTEM_PROMPT},
@@ -87,8 +84,6 @@ def rewrite_query(client, user_query):
         ],
     )
 
-    rewrites = res.choices[0].message.content
-
     print(f"Original User Query: {user_query}")
     print("Rewritten: ", rewrites)
 
@@ -97,11 +92,7 @@ def rewrite_query(client, user_query):
 
 def retrieve_unique_docs(embeddings, query):
     print("Retrieving Relevant Unique Chunks..")
-    retriever = QdrantVectorStore.from_existing_collection(
-        url="http://localhost:6333",
-        collection_name="parallel_query",
-        embedding=embeddings,
-    )
+    retriever = get_vector_store(embeddings, collection_name="parallel_query")
 
     chunks = retriever.similarity_search(query=query)
     pages = {doc.metadata.get("page") for doc in chunks}
@@ -111,71 +102,134 @@ def retrieve_unique_docs(embeddings, query):
     return chunks
 
 
-def format_context(docs):
-    context_blocks = []
-    for i, doc in enumerate(docs, start=1):
-        page = doc.metadata.get("page", "unknown")
-        snippet = doc.page_content.strip().replace("\n", " ")
-        context_blocks.append(f"doc_{i} (page {page}): {snippet}...")
-    return "\n\n".join(context_blocks)
+def stream_passage(client, user_query, min_chars, stop):
+    """
+    Stream the hypothetical passage and return it as soon as it has
+    `min_chars` and ends on a sentence, or when `stop` is set. The stream is
+    closed early, so the rest of the passage is never generated.
+    """
+    stream = client.chat.completions.create(
+        model="gpt-4o-mini",
+        messages=[
+            {"role": "system", "content": HYDE_PROMPT},
+            {"role": "user", "content": user_query},
+        ],
+        stream=True,
+    )
+    parts = []
+    try:
+        for chunk in stream:
+            if stop.is_set():
+                return None
+            if not chunk.choices or not chunk.choices[0].delta.content:
+                continue
+            parts.append(chunk.choices[0].delta.content)
+            passage = "".join(parts)
+            if len(passage) >= min_chars and passage.rstrip().endswith((".", "!", "?")):
+                break
+    finally:
+        stream.close()
+    return "".join(parts)
+
+
+def speculative_hyde(client, embeddings, user_query, k=4, min_chars=200, deadline=3.0):
+    """
+    HyDE without the serial LLM hops: direct retrieval for the query starts
+    right away while the hypothetical passage streams, and the passage is
+    searched as soon as enough of it has arrived. Both result lists are
+    fused with RRF. If the passage search isn't back `deadline` seconds
+    after the start, the direct results are used alone.
+    """
+    retriever = get_vector_store(embeddings, collection_name="parallel_query")
+    started = time.perf_counter()
+    stop = threading.Event()
+
+    def passage_search():
+        passage = stream_passage(client, user_query, min_chars, stop)
+        if not passage:
+            return []
+        print(
+            f"passage ready +{(time.perf_counter() - started) * 1000:.0f} ms:", passage
+        )
+        return retriever.similarity_search(query=passage, k=k)
+
+    pool = ThreadPoolExecutor(max_workers=2)
+    direct_future = pool.submit(retriever.similarity_search, query=user_query, k=k)
+    hyde_future = pool.submit(passage_search)
+    # don't let an overdue passage search hold up the answer
+    pool.shutdown(wait=False)
+
+    direct = direct_future.result()
+    print(f"direct retrieval +{(time.perf_counter() - started) * 1000:.0f} ms")
+
+    try:
+        remaining = max(deadline - (time.perf_counter() - started), 0)
+        hyde = hyde_future.result(timeout=remaining)
+    except TimeoutError:
+        stop.set()
+        print(f"⏱️ passage missed the {deadline:.1f}s deadline, using direct results")
+        return direct
+    except Exception as exc:
+        # the passage is only a bonus, a failed stream or search mustn't lose the answer
+        stop.set()
+        print(f"⚠️ passage search failed ({exc!r}), using direct results")
+        return direct
+
+    doc_map = {chunk_key(doc): doc for doc in direct + hyde}
+    fused = fuse(
+        [[chunk_key(doc) for doc in direct], [chunk_key(doc) for doc in hyde]],
+        top_n=k,
+    )
+    print(f"merged retrieval +{(time.perf_counter() - started) * 1000:.0f} ms")
+    return [doc_map[doc_id] for doc_id, _ in fused]
+
+
+def multi_hypothesis_hyde(client, embeddings, user_query, n=4, k=4):
+    """
+    HyDE with `n` hypothetical passages from one completion (`n=`). The
+    query and all passages are embedded in one batched request, and their
+    normalised mean vector is searched once, so recall improves without
+    adding round trips.
+    """
+    resp = client.chat.completions.create(
+        model="gpt-4o-mini",
+        messages=[
+            {"role": "system", "content": HYDE_PROMPT},
+            {"role": "user", "content": user_query},
+        ],
+        n=n,
+        temperature=0.7,  # some spread, or the n passages are near-identical
+    )
+    passages = [choice.message.content for choice in resp.choices]
+    for i, passage in enumerate(passages, start=1):
+        print(f"Passage {i}: {passage}")
 
+    vectors = np.asarray(
+        embeddings.embed_documents([user_query, *passages]), dtype=np.float32
+    )
+    vectors /= np.linalg.norm(vectors, axis=1, keepdims=True)
+    mean = vectors.mean(axis=0)
 
-def get_answers(relevant_chunks, user_query, client):
+    retriever = get_vector_store(embeddings, collection_name="parallel_query")
+    return retriever.similarity_search_by_vector(
+        (mean / np.linalg.norm(mean)).tolist(), k=k
+    )
 
-    context = format_context(relevant_chunks)
 
-    print("context given to context", context)
+def format_context(docs, max_tokens=DEFAULT_CONTEXT_TOKENS):
+    return build_context(docs, max_tokens=max_tokens)
 
-    SYSTEM_PROMPT = f"""
-    You are an expert AI assistant. Base all answers only on the provided Context.
-
-    Return a single JSON object (no extra text) using this schema:
-    {{
-    "stage": "one of: analyse, considerations, validation, result, output",
-    "content": "string (concise, user-facing; max 150 words)",
-    "sources": ["optional short references to the provided context, e.g. 'doc_3: paragraph 2'"],
-    "status": "final" or "continue"
-    }}
-
-    Behavior rules:
-    - "analyse": 1–2 sentence summary of what the user asked and the relevant context to check.
-    - "considerations": up to 3 short bullets (each 1 sentence) listing factors considered — user-facing, not private reasoning.
-    - "validation": one short sentence indicating if the chosen interpretation aligns with the context/sources.
-    - "result": proper answer summary.
-    - "output": the final user-facing answer, clear and actionable (this is what should be shown to the user).
-    - If more context or clarification is needed, set "status":"continue". Otherwise "status":"final".
-    - Always return strictly valid JSON (no surrounding explanation text).
-    - Do not answer on your own, only answer from the context.
-    - If you don’t find the answer in context, return:  {{ "status" : "final" , "content": "I dont know bruv" }}
-
-
-    Context: {context}
-    """
 
-    messages = [
-        {"role": "system", "content": SYSTEM_PROMPT},
-        {"role": "user", "content": user_query},
-    ]
+def get_answers(relevant_chunks, user_query, client):
 
-    for attempt in range(3):
-        resp = client.chat.completions.create(
-            model="gpt-4o-mini",
-            messages=messages,
-            temperature=0,
-        )
-        try:
-            # print("response", resp)
-            parsed = json.loads(resp.choices[0].message.content)
-        except json.JSONDecodeError:
-            print(f"⚠️ Invalid JSON at attempt {attempt+1}, retrying...")
-            continue
+    context = format_context(relevant_chunks)
+
+    print("context given to context", context)
 
-        if parsed.get("status") == "final":
-            print(f"✅ Final answer: {parsed['content']}")
-            break
+    return answer_from_context(client, context, user_query)
 
 
-def main():
+def main(mode="speculative"):
     client, embeddings = init_clients()
 
     pdf_path = Path(__file__).parent / "rag_practice.pdf"
@@ -186,11 +240,16 @@ def main():
 
     trick_question = "how good are movies?"
 
-    query_translation = rewrite_query(client, trick_question)
+    if mode == "speculative":
+        unique_chunk_list = speculative_hyde(client, embeddings, trick_question)
+    elif mode == "multi":
+        unique_chunk_list = multi_hypothesis_hyde(client, embeddings, trick_question)
+    else:
+        query_translation = rewrite_query(client, trick_question)
 
-    llm_answer = llm(client, query_translation)
+        llm_answer = llm(client, query_translation)
 
-    unique_chunk_list = retrieve_unique_docs(embeddings, llm_answer)
+        unique_chunk_list = retrieve_unique_docs(embeddings, llm_answer)
 
     get_answers(unique_chunk_list, trick_question, client)
 
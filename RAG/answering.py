@@ -0,0 +1,169 @@
+import json
+from collections import Counter
+from json_stream import JsonRepair
+
+ANSWER_FORMAT = {
+    "type": "json_schema",
+    "json_schema": {
+        "name": "answer_schema",
+        "strict": True,
+        "schema": {
+            "type": "object",
+            "properties": {
+                "stage": {
+                    "type": "string",
+                    "enum": [
+                        "analyse",
+                        "considerations",
+                        "validation",
+                        "result",
+                        "output",
+                    ],
+                },
+                "content": {"type": "string"},
+                "sources": {"type": "array", "items": {"type": "string"}},
+                "status": {"type": "string", "enum": ["final", "continue"]},
+            },
+            "required": ["stage", "content", "sources", "status"],
+            "additionalProperties": False,
+        },
+    },
+}
+
+# calls, repairs, retries and prompt/cached tokens across answers
+answer_stats = Counter()
+
+# OpenAI only caches prompt prefixes of at least this many tokens
+CACHE_MIN_TOKENS = 1024
+
+
+# Kept byte-identical across requests and placed first; everything that
+# varies goes after it. At a few hundred tokens it is below
+# CACHE_MIN_TOKENS on its own, so a different question with different
+# context reports 0 cached. A hit needs the context to repeat too: a retry
+# in answer_from_context, or the same question again within a few minutes.
+ANSWER_INSTRUCTIONS = """
+You are an expert AI assistant. Base all answers only on the provided Context.
+
+Fields:
+- "stage": one of analyse, considerations, validation, result, output.
+- "content": concise, user-facing; max 150 words.
+- "sources": short references to the provided context, e.g. 'doc_3: paragraph 2'.
+- "status": "final" or "continue".
+
+Behavior rules:
+- "analyse": 1–2 sentence summary of what the user asked and the relevant context to check.
+- "considerations": up to 3 short bullets (each 1 sentence) listing factors considered — user-facing, not private reasoning.
+- "validation": one short sentence indicating if the chosen interpretation aligns with the context/sources.
+- "result": proper answer summary.
+- "output": the final user-facing answer, clear and actionable (this is what should be shown to the user).
+- If more context or clarification is needed, set "status":"continue". Otherwise "status":"final".
+- Do not answer on your own, only answer from the context.
+- If you don’t find the answer in context, answer with status "final" and content "I dont know bruv".
+"""
+
+
+def answer_messages(context, user_query):
+    return [
+        {"role": "system", "content": ANSWER_INSTRUCTIONS},
+        {"role": "system", "content": f"Context:\n{context}"},
+        {"role": "user", "content": user_query},
+    ]
+
+
+def report_cache_usage(resp, label="answer"):
+    """
+    Print cached vs uncached prompt tokens for one completion and add them
+    to `answer_stats`. OpenAI only caches prefixes of CACHE_MIN_TOKENS+
+    tokens, in 128-token steps, so short prompts always report 0 cached.
+    """
+    usage = getattr(resp, "usage", None)
+    if usage is None:
+        return 0, 0
+    details = getattr(usage, "prompt_tokens_details", None)
+    cached = (getattr(details, "cached_tokens", None) or 0) if details else 0
+    prompt = usage.prompt_tokens
+
+    answer_stats["prompt_tokens"] += prompt
+    answer_stats["cached_tokens"] += cached
+    note = (
+        f", below the {CACHE_MIN_TOKENS}-token minimum"
+        if prompt < CACHE_MIN_TOKENS
+        else ""
+    )
+    print(
+        f"🧾 {label}: {prompt} prompt tokens, {cached} cached, "
+        f"{prompt - cached} uncached ({cached / max(prompt, 1):.0%} hit{note})"
+    )
+    return prompt, cached
+
+
+def cache_hit_rate():
+    """Share of prompt tokens served from the provider's cache so far."""
+    return answer_stats["cached_tokens"] / max(answer_stats["prompt_tokens"], 1)
+
+
+def parse_answer(resp):
+    """The answer dict from a completion, repairing truncated JSON. None if unusable."""
+    message = resp.choices[0].message
+    if getattr(message, "refusal", None):
+        return {
+            "stage": "output",
+            "content": message.refusal,
+            "sources": [],
+            "status": "final",
+        }
+
+    try:
+        parsed = json.loads(message.content)
+    except (json.JSONDecodeError, TypeError):
+        try:
+            parsed = JsonRepair().feed(message.content or "").parse()
+        except ValueError:
+            return None
+        answer_stats["repaired"] += 1
+
+    if not isinstance(parsed, dict) or not parsed.get("content"):
+        return None
+    return parsed
+
+
+def report_answer(parsed):
+    if parsed is None:
+        print("❌ No usable answer")
+    elif parsed.get("status") == "final":
+        print(f"✅ Final answer: {parsed['content']}")
+    else:
+        print(f"↪️ Needs more context: {parsed['content']}")
+
+
+def answer_from_context(client, context, user_query, model="gpt-4o-mini", attempts=2):
+    """
+    One schema-constrained completion. The output is already valid JSON in
+    the normal case; a second call is only made when even the repaired
+    output is unusable (e.g. empty), and is counted in `answer_stats`.
+    """
+    messages = answer_messages(context, user_query)
+
+    parsed = None
+    for attempt in range(attempts):
+        answer_stats["calls"] += 1
+        resp = client.chat.completions.create(
+            model=model,
+            messages=messages,
+            temperature=0,
+            response_format=ANSWER_FORMAT,
+        )
+        report_cache_usage(resp)
+        parsed = parse_answer(resp)
+        if parsed is not None:
+            break
+        if attempt + 1 < attempts:
+            answer_stats["retries"] += 1
+            print(
+                f"⚠️ Unusable answer at attempt {attempt+1} "
+                f"({resp.choices[0].finish_reason}), retrying..."
+            )
+
+    report_answer(parsed)
+    return parsed
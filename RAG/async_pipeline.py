@@ -0,0 +1,160 @@
+import asyncio
+import os
+import time
+from dotenv import load_dotenv
+from langchain_openai import OpenAIEmbeddings
+from openai import AsyncOpenAI
+from qdrant_client import AsyncQdrantClient
+from answering import (
+    ANSWER_FORMAT,
+    answer_messages,
+    parse_answer,
+    report_answer,
+    report_cache_usage,
+)
+from context_builder import DEFAULT_CONTEXT_TOKENS, build_context
+from embedding_cache import CachedEmbeddings
+from fusion import chunk_key, fuse
+from json_stream import StringListStream
+from retrievers import QDRANT_URL, point_to_document
+
+REWRITE_SYSTEM_PROMPT = """
+You are a helpful AI Assistant.
+Take the user query and rewrite it into 3 different questions.
+Return the output strictly as a JSON list of strings, nothing else.
+"""
+
+REWRITES_FORMAT = {
+    "type": "json_schema",
+    "json_schema": {
+        "name": "rewrites_schema",
+        "schema": {
+            "type": "object",
+            "properties": {
+                "questions": {
+                    "type": "array",
+                    "items": {"type": "string"},
+                    "minItems": 3,
+                    "maxItems": 3,
+                }
+            },
+            "required": ["questions"],
+            "additionalProperties": False,
+        },
+    },
+}
+
+
+def init_async_clients(url=QDRANT_URL):
+    print("loading async clients..")
+    load_dotenv()
+    openai_api_key = os.getenv("OPENAI_API_KEY")
+    client = AsyncOpenAI()
+    qdrant = AsyncQdrantClient(url=url, prefer_grpc=True)
+    embeddings = CachedEmbeddings(
+        OpenAIEmbeddings(model="text-embedding-3-large", api_key=openai_api_key)
+    )
+    print("async clients ready!")
+    return client, qdrant, embeddings
+
+
+async def search(qdrant, embeddings, query, collection_name="parallel_query", k=4):
+    vector = await embeddings.aembed_query(query)
+    response = await qdrant.query_points(
+        collection_name=collection_name,
+        query=vector,
+        limit=k,
+        with_payload=True,
+    )
+    return [point_to_document(p, collection_name) for p in response.points]
+
+
+async def stream_rewrites(client, user_query):
+    """Yield each rewritten question as soon as its JSON string is complete."""
+    stream = await client.chat.completions.create(
+        model="gpt-4o-mini",
+        messages=[
+            {"role": "system", "content": REWRITE_SYSTEM_PROMPT},
+            {"role": "user", "content": user_query},
+        ],
+        response_format=REWRITES_FORMAT,
+        stream=True,
+    )
+
+    questions = StringListStream("questions")
+    async for chunk in stream:
+        if not chunk.choices or not chunk.choices[0].delta.content:
+            continue
+        for question in questions.feed(chunk.choices[0].delta.content):
+            yield question
+
+
+def format_context(docs, max_tokens=DEFAULT_CONTEXT_TOKENS):
+    return build_context(docs, max_tokens=max_tokens)
+
+
+async def get_answers(client, relevant_chunks, user_query):
+    context = format_context(relevant_chunks)
+
+    resp = await client.chat.completions.create(
+        model="gpt-4o-mini",
+        messages=answer_messages(context, user_query),
+        temperature=0,
+        response_format=ANSWER_FORMAT,
+    )
+    report_cache_usage(resp)
+    return parse_answer(resp)
+
+
+async def run_pipeline(
+    client, qdrant, embeddings, user_query, collection_name="parallel_query", k=4, top_n=4
+):
+    """
+    rewrite -> retrieve -> answer, pipelined: the original query is searched
+    right away, and each rewrite is searched the moment it finishes
+    streaming, so end-to-end latency is roughly the critical path.
+    """
+    started = time.perf_counter()
+
+    searches = [
+        asyncio.create_task(search(qdrant, embeddings, user_query, collection_name, k))
+    ]
+    async for question in stream_rewrites(client, user_query):
+        print(f"rewrite +{(time.perf_counter() - started) * 1000:.0f} ms: {question}")
+        searches.append(
+            asyncio.create_task(search(qdrant, embeddings, question, collection_name, k))
+        )
+
+    results = await asyncio.gather(*searches)
+
+    doc_map = {}
+    rankings = []
+    for docs in results:
+        ranking = []
+        for doc in docs:
+            doc_id = chunk_key(doc)
+            doc_map[doc_id] = doc
+            ranking.append(doc_id)
+        rankings.append(ranking)
+
+    top_docs = [doc_map[doc_id] for doc_id, _ in fuse(rankings, top_n=top_n)]
+    print(f"retrieval done +{(time.perf_counter() - started) * 1000:.0f} ms")
+
+    answer = await get_answers(client, top_docs, user_query)
+    print(f"answer done +{(time.perf_counter() - started) * 1000:.0f} ms")
+    return answer
+
+
+async def main():
+    client, qdrant, embeddings = init_async_clients()
+
+    user_query = "What is a queue?"
+
+    answer = await run_pipeline(client, qdrant, embeddings, user_query)
+    report_answer(answer)
+
+    await qdrant.close()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,77 @@
+import time
+import numpy as np
+from langchain_openai import OpenAIEmbeddings
+from dotenv import load_dotenv
+import os
+from embedding_cache import CachedEmbeddings
+from local_index import DEFAULT_INDEX_DIR, LocalVectorIndex
+from retrievers import get_qdrant_client
+
+QUERIES = [
+    "What is a queue?",
+    "How does a stack differ from a queue?",
+    "Explain recursion with an example",
+    "What is a linked list used for?",
+    "Describe binary search",
+    "What is the time complexity of sorting?",
+]
+
+
+def time_ms(fn, repeats=20):
+    fn()  # warm up
+    started = time.perf_counter()
+    for _ in range(repeats):
+        fn()
+    return (time.perf_counter() - started) / repeats * 1000
+
+
+def main(collection_name="parallel_query", k=10):
+    load_dotenv()
+    embeddings = CachedEmbeddings(
+        OpenAIEmbeddings(
+            model="text-embedding-3-large", api_key=os.getenv("OPENAI_API_KEY")
+        )
+    )
+    client = get_qdrant_client()
+    vectors = embeddings.embed_documents(QUERIES)
+
+    def qdrant_search():
+        return [
+            [
+                str(p.id)
+                for p in client.query_points(
+                    collection_name=collection_name, query=v, limit=k
+                ).points
+            ]
+            for v in vectors
+        ]
+
+    truth = qdrant_search()
+    print(f"qdrant: {time_ms(qdrant_search):.2f} ms for {len(QUERIES)} queries")
+
+    for dtype in ["float32", "float16", "int8"]:
+        # one index per dtype, an index can't change dtype once built
+        index = LocalVectorIndex.from_qdrant(
+            client,
+            collection_name,
+            embeddings,
+            path=DEFAULT_INDEX_DIR / f"{collection_name}_{dtype}",
+            dtype=dtype,
+        )
+
+        def local_search():
+            return [
+                [index.docs[row][0] for row, _ in hits]
+                for hits in index.search_vectors(vectors, k)
+            ]
+
+        found = local_search()
+        recall = np.mean([len(set(t) & set(f)) / len(t) for t, f in zip(truth, found)])
+        print(
+            f"local {dtype}: {time_ms(local_search):.2f} ms, "
+            f"recall@{k} vs qdrant {recall:.3f}, {index.count} vectors"
+        )
+
+
+if __name__ == "__main__":
+    main()
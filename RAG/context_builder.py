@@ -0,0 +1,96 @@
+from functools import lru_cache
+import tiktoken
+from fusion import chunk_key
+
+DEFAULT_CONTEXT_TOKENS = 3000
+MIN_TRUNCATED_TOKENS = 64  # don't bother squeezing in a tail shorter than this
+
+
+@lru_cache(maxsize=None)
+def get_encoding(model="gpt-4o-mini"):
+    try:
+        return tiktoken.encoding_for_model(model)
+    except KeyError:
+        return tiktoken.get_encoding("o200k_base")
+
+
+def merge_chunks(docs):
+    """
+    Deduplicate and stitch chunks. `docs` is in relevance order; chunks of
+    the same source/page whose character spans overlap or touch (the splitter
+    keeps 200 chars of overlap) are merged into one span that takes the best
+    rank of its parts. Returns [(rank, page, text)] sorted by rank.
+    """
+    groups = {}
+    seen = set()
+    loose = []  # chunks ingested without start_index can only be deduplicated
+    for rank, doc in enumerate(docs):
+        key = chunk_key(doc)
+        if key in seen:
+            continue
+        seen.add(key)
+
+        start = doc.metadata.get("start_index")
+        page = doc.metadata.get("page", "unknown")
+        if start is None:
+            loose.append((rank, page, doc.page_content))
+            continue
+        group = (doc.metadata.get("source"), page)
+        groups.setdefault(group, []).append((start, rank, doc.page_content))
+
+    spans = list(loose)
+    for (_, page), chunks in groups.items():
+        chunks.sort()
+        start, rank, text = chunks[0]
+        end = start + len(text)
+        for next_start, next_rank, next_text in chunks[1:]:
+            if next_start <= end:
+                text += next_text[end - next_start :]
+                end = max(end, next_start + len(next_text))
+                rank = min(rank, next_rank)
+            else:
+                spans.append((rank, page, text))
+                start, rank, text = next_start, next_rank, next_text
+                end = start + len(text)
+        spans.append((rank, page, text))
+
+    spans.sort(key=lambda span: span[0])
+    return spans
+
+
+def build_context(docs, max_tokens=DEFAULT_CONTEXT_TOKENS, model="gpt-4o-mini"):
+    """
+    Context string for the answer prompt, never longer than `max_tokens`
+    (labels, "..." suffixes and separators included). Overlapping chunks
+    are merged by merge_chunks and the spans are packed most relevant
+    first; a span that doesn't fit is skipped for smaller ones, except that
+    the first miss may be truncated to fill the remaining budget.
+    """
+    encoding = get_encoding(model)
+    spans = [
+        (page, " ".join(text.split())) for _, page, text in merge_chunks(list(docs))
+    ]
+    token_lists = encoding.encode_ordinary_batch([text for _, text in spans])
+    # every block ends with "..." and blocks are joined with a blank line
+    overhead = len(encoding.encode_ordinary("...")) + len(
+        encoding.encode_ordinary("\n\n")
+    )
+
+    blocks = []
+    used = 0
+    truncated = False
+    for (page, text), tokens in zip(spans, token_lists):
+        label = f"doc_{len(blocks) + 1} (page {page}): "
+        cost = len(tokens) + len(encoding.encode_ordinary(label)) + overhead
+        remaining = max_tokens - used
+        if cost > remaining:
+            room = remaining - (cost - len(tokens))
+            if truncated or room < MIN_TRUNCATED_TOKENS:
+                continue
+            text = encoding.decode(tokens[:room])
+            cost = remaining
+            truncated = True
+        blocks.append(f"{label}{text}...")
+        used += cost
+
+    return "\n\n".join(blocks)
@@ -0,0 +1,104 @@
+import time
+from collections import defaultdict
+from functools import partial
+import numpy as np
+import HyDE
+import query_decomposition
+import reciprocate_rank_fusion
+import step_back_prompting
+from answering import answer_from_context
+from context_builder import build_context
+from query_routing import logical_router, semantic_router
+from retrievers import get_vector_store
+
+# upper bucket edges in ms for the per-route latency histograms
+LATENCY_BUCKETS_MS = [100, 250, 500, 1000, 2500, 5000, 10000, np.inf]
+
+
+def run_direct(client, embeddings, user_query):
+    """No rewriting hop: retrieve with the query as-is and answer."""
+    retriever = get_vector_store(embeddings, collection_name="parallel_query")
+    chunks = retriever.similarity_search(query=user_query, k=4)
+    return answer_from_context(client, build_context(chunks), user_query)
+
+
+def run_hyde(client, embeddings, user_query):
+    chunks = HyDE.speculative_hyde(client, embeddings, user_query)
+    return HyDE.get_answers(chunks, user_query, client)
+
+
+def run_step_back(client, embeddings, user_query):
+    query_list = step_back_prompting.rewrite_query(client, user_query)
+    chunks = step_back_prompting.retrieve_unique_docs(embeddings, query_list)
+    return step_back_prompting.get_answers(chunks, user_query, client)
+
+
+STRATEGIES = {
+    "DIRECT": run_direct,
+    "HYDE": run_hyde,
+    "STEPBACK": run_step_back,
+    "DECOMPOSE": query_decomposition.run_strategy_A,
+    "FUSION": reciprocate_rank_fusion.run_rank_fusion,
+}
+
+
+class Dispatcher:
+    """
+    Routes each query and runs only the matching strategy, reusing one warm
+    OpenAI client (plus one async client for the DAG decomposition),
+    cached embeddings and vector store handle for all of them. `router` is "rules" (free, in-process) or "semantic" (one
+    embeddings call, rules as the low-confidence fallback).
+    """
+
+    def __init__(self, router="rules", decomposition="A"):
+        self.client, self.embeddings = reciprocate_rank_fusion.init_clients()
+        self.router = logical_router if router == "rules" else semantic_router
+        self.strategies = dict(STRATEGIES)
+        if decomposition == "B":
+            self.strategies["DECOMPOSE"] = partial(
+                query_decomposition.run_strategy_B,
+                runtime=query_decomposition.get_async_runtime(),
+            )
+        self.latencies_ms = defaultdict(list)  # route -> end-to-end latencies
+
+    def dispatch(self, user_query):
+        started = time.perf_counter()
+        route = self.router(user_query)
+        print(f"\n🧭 {route}: {user_query}")
+        answer = self.strategies[route](self.client, self.embeddings, user_query)
+        self.latencies_ms[route].append((time.perf_counter() - started) * 1000)
+        return route, answer
+
+    def report(self):
+        """Per-route latency histogram, p50 and p95."""
+        for route, samples in sorted(self.latencies_ms.items()):
+            samples = np.asarray(samples)
+            counts = np.histogram(samples, bins=[0, *LATENCY_BUCKETS_MS])[0]
+            print(
+                f"\n{route}: n={len(samples)} "
+                f"p50={np.percentile(samples, 50):.0f} ms "
+                f"p95={np.percentile(samples, 95):.0f} ms"
+            )
+            for edge, count in zip(LATENCY_BUCKETS_MS, counts):
+                label = "inf" if edge == np.inf else f"{edge:.0f}"
+                print(f"  <= {label:>5} ms | {'#' * count} {count}")
+
+
+def main():
+    dispatcher = Dispatcher()
+
+    queries = [
+        "What is a queue?",
+        "Compare a stack vs a queue",
+        "How does recursion work?",
+        "Examples of sorting algorithms",
+        "Who invented the linked list?",
+    ]
+    for user_query in queries:
+        dispatcher.dispatch(user_query)
+
+    dispatcher.report()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,223 @@
+import hashlib
+import sqlite3
+import threading
+import time
+from pathlib import Path
+from typing import List
+import numpy as np
+from langchain_core.embeddings import Embeddings
+
+DEFAULT_CACHE_DIR = Path(__file__).parent / ".embedding_cache"
+
+
+class CachedEmbeddings(Embeddings):
+    """
+    Wraps any langchain Embeddings with a persistent cache keyed by
+    (model, sha256(text)). Vectors live in a memory-mapped float32 file, the
+    key -> slot index and LRU clock live in sqlite next to it. The file grows
+    geometrically as entries arrive; `max_entries` is only the LRU ceiling.
+    """
+
+    def __init__(self, embeddings, cache_dir=DEFAULT_CACHE_DIR, max_entries=100_000):
+        self.embeddings = embeddings
+        self.max_entries = max_entries
+
+        model = getattr(embeddings, "model", type(embeddings).__name__)
+        dimensions = getattr(embeddings, "dimensions", None)
+        self.namespace = f"{model}:{dimensions or 'native'}"
+
+        namespace_dir = hashlib.sha1(self.namespace.encode()).hexdigest()[:16]
+        self.path = Path(cache_dir) / namespace_dir
+        self.path.mkdir(parents=True, exist_ok=True)
+
+        self.lock = threading.Lock()
+        self.db = sqlite3.connect(self.path / "index.sqlite", check_same_thread=False)
+        self.db.execute(
+            "CREATE TABLE IF NOT EXISTS entries "
+            "(key TEXT PRIMARY KEY, slot INTEGER NOT NULL, last_used REAL NOT NULL)"
+        )
+        self.db.execute("CREATE TABLE IF NOT EXISTS meta (name TEXT PRIMARY KEY, value)")
+        self.db.commit()
+
+        self.dim = None
+        self.capacity = 0
+        self.vectors = None
+        row = self.db.execute("SELECT value FROM meta WHERE name = 'dim'").fetchone()
+        if row:
+            self._open_vectors(int(row[0]))
+
+        self.hits = 0
+        self.misses = 0
+
+    def _open_vectors(self, dim):
+        self.dim = dim
+        vectors_path = self.path / "vectors.f32"
+        row = self.db.execute(
+            "SELECT value FROM meta WHERE name = 'capacity'"
+        ).fetchone()
+        if row:
+            capacity = int(row[0])
+        elif vectors_path.exists():  # caches written before capacity was recorded
+            capacity = vectors_path.stat().st_size // (dim * 4)
+        else:
+            capacity = 0
+
+        if capacity > self.max_entries:
+            capacity = self._shrink(vectors_path, dim, capacity)
+        self._map(capacity)
+
+    def _map(self, capacity):
+        """Map vectors.f32 with room for `capacity` vectors, growing the file."""
+        vectors_path = self.path / "vectors.f32"
+        # np.memmap can't map past the end of the file (or an empty one), so
+        # size it first
+        with open(vectors_path, "ab") as f:
+            f.truncate(max(capacity * self.dim * 4, f.tell()))
+        self.vectors = (
+            np.memmap(
+                vectors_path,
+                dtype=np.float32,
+                mode="r+",
+                shape=(capacity, self.dim),
+            )
+            if capacity
+            else None
+        )
+        self.capacity = capacity
+        self.db.executemany(
+            "INSERT OR REPLACE INTO meta VALUES (?, ?)",
+            [("dim", self.dim), ("capacity", capacity)],
+        )
+        self.db.commit()
+
+    def _shrink(self, vectors_path, dim, capacity):
+        """
+        Keep the most recently used max_entries, compacted into slots 0..n-1.
+        Returns the new capacity.
+        """
+        kept = self.db.execute(
+            "SELECT key, slot, last_used FROM entries ORDER BY last_used DESC LIMIT ?",
+            (self.max_entries,),
+        ).fetchall()
+        old = np.memmap(vectors_path, dtype=np.float32, mode="r", shape=(capacity, dim))
+        vectors = np.array(old[[slot for _, slot, _ in kept]], dtype=np.float32)
+        del old
+
+        self.db.execute("DELETE FROM entries")
+        self.db.executemany(
+            "INSERT INTO entries VALUES (?, ?, ?)",
+            [(key, slot, last_used) for slot, (key, _, last_used) in enumerate(kept)],
+        )
+        with open(vectors_path, "r+b") as f:
+            f.write(vectors.tobytes())
+            f.truncate(len(kept) * dim * 4)
+        self.db.commit()
+        return len(kept)
+
+    @staticmethod
+    def _key(text):
+        return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+    def _lookup(self, keys):
+        found = {}
+        if self.vectors is None:
+            return found
+
+        now = time.time()
+        for i in range(0, len(keys), 500):
+            part = keys[i : i + 500]
+            marks = ",".join("?" * len(part))
+            rows = self.db.execute(
+                f"SELECT key, slot FROM entries WHERE key IN ({marks})", part
+            ).fetchall()
+            for key, slot in rows:
+                found[key] = self.vectors[slot].tolist()
+            self.db.executemany(
+                "UPDATE entries SET last_used = ? WHERE key = ?",
+                [(now, key) for key, _ in rows],
+            )
+        self.db.commit()
+        return found
+
+    def _free_slots(self, n):
+        used = self.db.execute("SELECT COUNT(*) FROM entries").fetchone()[0]
+        if used + n > self.capacity and self.capacity < self.max_entries:
+            # grow geometrically, like LocalVectorIndex, up to the LRU ceiling
+            self._map(min(self.max_entries, max(used + n, self.capacity * 2, 1024)))
+        fresh = list(range(used, min(used + n, self.capacity)))
+
+        # out of room: evict the least recently used entries and reuse their slots
+        missing = n - len(fresh)
+        if missing > 0:
+            evicted = self.db.execute(
+                "SELECT key, slot FROM entries ORDER BY last_used LIMIT ?", (missing,)
+            ).fetchall()
+            self.db.executemany(
+                "DELETE FROM entries WHERE key = ?", [(key,) for key, _ in evicted]
+            )
+            fresh.extend(slot for _, slot in evicted)
+        return fresh
+
+    def _store(self, keys, vectors):
+        if self.dim is None:
+            self._open_vectors(len(vectors[0]))
+
+        # another worker may have stored the same text while we were embedding
+        present = set(self._lookup(keys))
+        pairs = [(k, v) for k, v in zip(keys, vectors) if k not in present]
+        if not pairs:
+            return
+
+        # only the most recent max_entries can ever fit
+        pairs = pairs[-self.max_entries :]
+        keys = [k for k, _ in pairs]
+        vectors = [v for _, v in pairs]
+        slots = self._free_slots(len(keys))
+        now = time.time()
+        for slot, vector in zip(slots, vectors):
+            self.vectors[slot] = vector
+        self.vectors.flush()
+        self.db.executemany(
+            "INSERT OR REPLACE INTO entries VALUES (?, ?, ?)",
+            [(key, slot, now) for key, slot in zip(keys, slots)],
+        )
+        self.db.commit()
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        keys = [self._key(text) for text in texts]
+
+        with self.lock:
+            found = self._lookup(list(set(keys)))
+
+        missing = {}
+        for key, text in zip(keys, texts):
+            if key not in found:
+                missing.setdefault(key, text)
+
+        self.hits += len(texts) - len(missing)
+        self.misses += len(missing)
+
+        if missing:
+            # the API call happens outside the lock so workers embed in parallel
+            new_vectors = self.embeddings.embed_documents(list(missing.values()))
+            with self.lock:
+                self._store(list(missing.keys()), new_vectors)
+            found.update(zip(missing.keys(), new_vectors))
+
+        return [found[key] for key in keys]
+
+    def embed_query(self, text: str) -> List[float]:
+        key = self._key(text)
+
+        with self.lock:
+            found = self._lookup([key])
+
+        if key in found:
+            self.hits += 1
+            return found[key]
+
+        self.misses += 1
+        vector = self.embeddings.embed_query(text)
+        with self.lock:
+            self._store([key], [vector])
+        return vector
@@ -0,0 +1,118 @@
+import hashlib
+import numpy as np
+
+METHODS = ("rrf", "combsum", "combmnz")
+
+
+def chunk_key(doc):
+    """Stable id of a retrieved chunk: the Qdrant point id when present."""
+    point_id = doc.metadata.get("_id")
+    if point_id is not None:
+        return str(point_id)
+
+    digest = hashlib.sha1(doc.page_content.encode("utf-8")).hexdigest()[:16]
+    return f"{doc.metadata.get('source')}::{doc.metadata.get('page')}::{digest}"
+
+
+def encode_rankings(rankings):
+    """Map string ids to dense ints. Returns (one int array per ranking, vocab)."""
+    index = {}
+    arrays = [
+        np.fromiter(
+            (index.setdefault(doc_id, len(index)) for doc_id in ranking),
+            dtype=np.int64,
+            count=len(ranking),
+        )
+        for ranking in rankings
+    ]
+    return arrays, list(index)
+
+
+def top_k_indices(values, top_n=None):
+    """Indices of the top_n largest values, best first, without a full sort."""
+    if top_n is None or top_n >= len(values):
+        return np.argsort(-values, kind="stable")
+    if top_n <= 0:
+        return np.empty(0, dtype=np.int64)
+
+    part = np.argpartition(-values, top_n - 1)[:top_n]
+    return part[np.argsort(-values[part], kind="stable")]
+
+
+def fuse_ids(
+    id_arrays, n_ids, method="rrf", k=60, weights=None, scores=None, top_n=None
+):
+    """
+    Fuse ranked lists of integer ids in [0, n_ids).
+
+    - rrf: sum of weight / (k + rank + 1); pass `weights` for weighted RRF
+    - combsum: sum of min-max normalised scores (rank-based if no `scores`)
+    - combmnz: combsum multiplied by the number of lists that returned the id
+
+    Returns (ids, fused scores), best first.
+    """
+    if method not in METHODS:
+        raise ValueError(f"Unknown fusion method {method!r}, expected one of {METHODS}")
+
+    weights = [1.0] * len(id_arrays) if weights is None else list(weights)
+    keep = [i for i, ids in enumerate(id_arrays) if len(ids)]
+    if not keep:
+        return np.empty(0, dtype=np.int64), np.empty(0)
+
+    ids = np.concatenate([np.asarray(id_arrays[i], dtype=np.int64) for i in keep])
+    depth = max(len(id_arrays[i]) for i in keep)
+    if method == "rrf":
+        rank_table = 1.0 / (k + np.arange(1, depth + 1))
+
+    # per-list contributions are built from small per-rank tables and
+    # concatenated, which is much cheaper than elementwise maths over all hits
+    parts = []
+    for i in keep:
+        n = len(id_arrays[i])
+        if method == "rrf":
+            part = rank_table[:n]
+        elif scores is None:
+            # rank-based score in (0, 1]: top hit 1.0, falling linearly
+            part = 1.0 - np.arange(n) / n
+        else:
+            raw = np.asarray(scores[i], dtype=float)
+            low, high = raw.min(), raw.max()
+            part = (raw - low) / (high - low) if high > low else np.ones(n)
+        parts.append(part * weights[i] if weights[i] != 1.0 else part)
+
+    contrib = np.concatenate(parts)
+    fused = np.bincount(ids, weights=contrib, minlength=n_ids)
+
+    if method == "rrf":
+        candidates = np.flatnonzero(fused)
+    else:
+        # a combsum score can be 0 for a real hit, so track presence explicitly
+        hits = np.bincount(ids, minlength=n_ids)
+        if method == "combmnz":
+            fused *= hits
+        candidates = np.flatnonzero(hits)
+
+    order = top_k_indices(fused[candidates], top_n)
+    top = candidates[order]
+    return top, fused[top]
+
+
+def fuse(rankings, method="rrf", k=60, weights=None, scores=None, top_n=None):
+    """
+    Fuse ranked lists of chunk ids. Returns [(chunk_id, score)], best first.
+
+    Mapping string ids to ints is a Python dict pass over every hit and
+    dominates the cost (~20 ms for 100 lists of 1000); callers that can
+    assign int ids while retrieving should call `fuse_ids` directly.
+    """
+    arrays, vocab = encode_rankings(rankings)
+    top, values = fuse_ids(
+        arrays,
+        len(vocab),
+        method=method,
+        k=k,
+        weights=weights,
+        scores=scores,
+        top_n=top_n,
+    )
+    return [(vocab[i], float(score)) for i, score in zip(top, values)]
@@ -0,0 +1,80 @@
+from fusion import chunk_key, fuse
+from local_index import LocalVectorIndex
+from retrievers import batch_similarity_search, point_to_document
+
+
+def fetch_documents(vector_store, ids):
+    """Load chunks by id from whichever backend the vector store uses."""
+    if not ids:
+        return {}
+    if isinstance(vector_store, LocalVectorIndex):
+        return {doc.metadata["_id"]: doc for doc in vector_store.get_by_ids(ids)}
+
+    points = vector_store.client.retrieve(
+        collection_name=vector_store.collection_name,
+        ids=list(ids),
+        with_payload=True,
+        with_vectors=False,
+    )
+    return {
+        str(p.id): point_to_document(
+            p,
+            vector_store.collection_name,
+            vector_store.content_payload_key,
+            vector_store.metadata_payload_key,
+        )
+        for p in points
+    }
+
+
+def hybrid_search(
+    vector_store,
+    sparse_index,
+    queries,
+    k=4,
+    candidates=20,
+    method="rrf",
+    weights=(1.0, 1.0),
+):
+    """
+    Dense + BM25 retrieval fused in-process. Both sides fetch `candidates`
+    hits per query (dense in one batched round trip), the two rankings are
+    fused with `method` and the top `k` chunks are returned per query.
+    Falls back to dense only while the sparse index is empty.
+    """
+    queries = list(queries)
+    dense = batch_similarity_search(
+        vector_store, queries, k=candidates, with_scores=True
+    )
+    if sparse_index is None or len(sparse_index) == 0:
+        return [[doc for doc, _ in hits[:k]] for hits in dense]
+
+    sparse = sparse_index.search_many(queries, k=candidates)
+
+    fused_ids = []
+    doc_map = {}
+    missing = set()
+    for dense_hits, sparse_hits in zip(dense, sparse):
+        dense_ids = []
+        for doc, _ in dense_hits:
+            doc_id = chunk_key(doc)
+            doc_map[doc_id] = doc
+            dense_ids.append(doc_id)
+        sparse_ids = [doc_id for doc_id, _ in sparse_hits]
+
+        scores = None
+        if method != "rrf":
+            scores = [[s for _, s in dense_hits], [s for _, s in sparse_hits]]
+        top = fuse(
+            [dense_ids, sparse_ids],
+            method=method,
+            weights=list(weights),
+            scores=scores,
+            top_n=k,
+        )
+        fused_ids.append([doc_id for doc_id, _ in top])
+        missing.update(doc_id for doc_id, _ in top if doc_id not in doc_map)
+
+    # keyword-only hits weren't returned by the dense search, load them once
+    doc_map.update(fetch_documents(vector_store, missing))
+    return [[doc_map[i] for i in ids if i in doc_map] for ids in fused_ids]
@@ -0,0 +1,387 @@
+import hashlib
+import os
+import threading
+import uuid
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from langchain_community.document_loaders import PyPDFLoader
+from langchain_text_splitters import RecursiveCharacterTextSplitter
+from qdrant_client.http import models
+from local_index import DEFAULT_INDEX_DIR, LocalVectorIndex
+from retrievers import get_qdrant_client
+from sparse_index import BM25Index
+
+
+CHUNK_NAMESPACE = uuid.UUID("6f1d3c1e-2b7a-4c55-9a0e-3f5b8d2c7e41")
+
+
+def content_hash(text):
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+def chunk_id(doc):
+    """
+    Deterministic point id from (source, page, offset, content hash), so
+    upserting the same chunk twice overwrites instead of duplicating.
+    """
+    metadata = doc.metadata
+    digest = metadata.get("content_hash") or content_hash(doc.page_content)
+    key = "|".join(
+        str(part)
+        for part in (
+            metadata.get("source"),
+            metadata.get("page"),
+            metadata.get("start_index"),
+            digest,
+        )
+    )
+    return str(uuid.uuid5(CHUNK_NAMESPACE, key))
+
+
+def quantization_config(quantization):
+    """None, "scalar" (int8, 4x smaller) or "binary" (1 bit per dim, 32x smaller)."""
+    if quantization is None:
+        return None
+    if quantization == "scalar":
+        return models.ScalarQuantization(
+            scalar=models.ScalarQuantizationConfig(
+                type=models.ScalarType.INT8, quantile=0.99, always_ram=True
+            )
+        )
+    if quantization == "binary":
+        return models.BinaryQuantization(
+            binary=models.BinaryQuantizationConfig(always_ram=True)
+        )
+    raise ValueError(f"Unknown quantization {quantization!r}")
+
+
+def ensure_collection(client, collection_name, vector_size, quantization=None):
+    """
+    Create the collection the same way QdrantVectorStore would, if missing.
+    With `quantization`, only the quantised vectors stay in RAM and the
+    full-precision originals move to disk for rescoring.
+    """
+    if client.collection_exists(collection_name):
+        return
+    client.create_collection(
+        collection_name=collection_name,
+        vectors_config=models.VectorParams(
+            size=vector_size,
+            distance=models.Distance.COSINE,
+            on_disk=quantization is not None,
+        ),
+        quantization_config=quantization_config(quantization),
+    )
+
+
+def iter_chunks(pdf_path, chunk_size=1000, chunk_overlap=200):
+    """Parse the PDF one page at a time and yield its chunks."""
+    loader = PyPDFLoader(file_path=pdf_path)
+    text_splitter = RecursiveCharacterTextSplitter(
+        chunk_size=chunk_size,
+        chunk_overlap=chunk_overlap,
+        add_start_index=True,
+    )
+
+    for page in loader.lazy_load():
+        for chunk in text_splitter.split_documents([page]):
+            chunk.metadata["content_hash"] = content_hash(chunk.page_content)
+            yield chunk
+
+
+def iter_batches(chunks, batch_size):
+    batch = []
+    for chunk in chunks:
+        batch.append(chunk)
+        if len(batch) == batch_size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+def existing_ids(client, collection_name, ids):
+    points = client.retrieve(
+        collection_name=collection_name,
+        ids=ids,
+        with_payload=False,
+        with_vectors=False,
+    )
+    return {str(point.id) for point in points}
+
+
+def embed_and_upsert(
+    client,
+    collection_name,
+    embeddings,
+    batch,
+    ready,
+    ready_lock,
+    incremental,
+    quantization=None,
+    wait=False,
+):
+    """Embed and upsert one batch. Returns (upserted, skipped)."""
+    ids = [chunk_id(doc) for doc in batch]
+
+    # ids include the content hash, so an id that already exists means the
+    # chunk is unchanged and doesn't need to be embedded again
+    if incremental and ready.is_set():
+        known = existing_ids(client, collection_name, ids)
+        fresh = [(i, doc) for i, doc in zip(ids, batch) if i not in known]
+        if not fresh:
+            return 0, len(batch)
+        ids, batch = [i for i, _ in fresh], [doc for _, doc in fresh]
+        skipped = len(known)
+    else:
+        skipped = 0
+
+    vectors = embeddings.embed_documents([doc.page_content for doc in batch])
+
+    # the first batch decides the vector size, every other worker waits on it
+    if not ready.is_set():
+        with ready_lock:
+            if not ready.is_set():
+                ensure_collection(
+                    client, collection_name, len(vectors[0]), quantization
+                )
+                ready.set()
+
+    points = [
+        models.PointStruct(
+            id=point_id,
+            vector=vector,
+            payload={"page_content": doc.page_content, "metadata": doc.metadata},
+        )
+        for point_id, doc, vector in zip(ids, batch, vectors)
+    ]
+    client.upsert(collection_name=collection_name, points=points, wait=wait)
+    return len(points), skipped
+
+
+def prune_source(client, collection_name, source, keep_ids):
+    """Delete points of `source` that weren't produced by this ingestion run."""
+    source_filter = models.Filter(
+        must=[
+            models.FieldCondition(
+                key="metadata.source", match=models.MatchValue(value=source)
+            )
+        ]
+    )
+
+    stale = []
+    offset = None
+    while True:
+        points, offset = client.scroll(
+            collection_name=collection_name,
+            scroll_filter=source_filter,
+            limit=1000,
+            offset=offset,
+            with_payload=False,
+            with_vectors=False,
+        )
+        stale.extend(p.id for p in points if str(p.id) not in keep_ids)
+        if offset is None:
+            break
+
+    if stale:
+        client.delete(
+            collection_name=collection_name,
+            points_selector=models.PointIdsList(points=stale),
+        )
+    return stale
+
+
+def stream_pdf_into_qdrant(
+    pdf_path,
+    embeddings,
+    collection_name="parallel_query",
+    url="http://localhost:6333",
+    batch_size=64,
+    workers=None,
+    max_pending=None,
+    incremental=True,
+    quantization=None,
+    sparse=True,
+    wait=False,
+):
+    """
+    Streaming ingestion: pages are parsed lazily, chunks are grouped into
+    batches and each batch is embedded + upserted on a worker pool. At most
+    `max_pending` batches are in flight, so memory stays flat no matter how
+    big the PDF is.
+
+    Point ids are derived from the chunk content, so re-running is
+    idempotent. With `incremental`, chunks already stored are not
+    re-embedded and chunks that disappeared from the PDF are deleted.
+
+    `quantization` ("scalar" / "binary") only applies when the collection
+    is created by this call. With `sparse`, a BM25 index of the same chunk
+    ids is kept in sync for hybrid search.
+
+    Upserts don't wait for Qdrant to apply them unless `wait` is set, so
+    pass wait=True before searching the collection straight away.
+    """
+    workers = workers or min(8, (os.cpu_count() or 1) + 2)
+    max_pending = max_pending or workers * 2
+
+    client = get_qdrant_client(url)
+    ready = threading.Event()
+    ready_lock = threading.Lock()
+    if client.collection_exists(collection_name):
+        ready.set()
+
+    slots = threading.BoundedSemaphore(max_pending)
+    futures = []
+    seen = {}  # source -> chunk ids produced in this run
+    upserted = skipped = 0
+    sparse_index = BM25Index.load(collection_name) if sparse else None
+
+    def release(future):
+        slots.release()
+
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        for batch in iter_batches(iter_chunks(pdf_path), batch_size):
+            batch_ids = [chunk_id(doc) for doc in batch]
+            for doc, doc_id in zip(batch, batch_ids):
+                seen.setdefault(doc.metadata.get("source"), set()).add(doc_id)
+            if sparse_index is not None:
+                sparse_index.add(batch_ids, [doc.page_content for doc in batch])
+
+            slots.acquire()  # backpressure: block parsing while workers catch up
+            future = pool.submit(
+                embed_and_upsert,
+                client,
+                collection_name,
+                embeddings,
+                batch,
+                ready,
+                ready_lock,
+                incremental,
+                quantization,
+                wait,
+            )
+            future.add_done_callback(release)
+            futures.append(future)
+
+            # drop finished futures so the list doesn't hold every batch
+            pending = []
+            for f in futures:
+                if f.done():
+                    done_upserted, done_skipped = f.result()
+                    upserted += done_upserted
+                    skipped += done_skipped
+                else:
+                    pending.append(f)
+            futures = pending
+
+        for f in futures:
+            done_upserted, done_skipped = f.result()
+            upserted += done_upserted
+            skipped += done_skipped
+
+    deleted = 0
+    if incremental:
+        for source, keep_ids in seen.items():
+            stale = prune_source(client, collection_name, source, keep_ids)
+            deleted += len(stale)
+            if sparse_index is not None:
+                sparse_index.delete(str(point_id) for point_id in stale)
+
+    if sparse_index is not None:
+        sparse_index.save()
+
+    print(
+        f"Upserted {upserted} chunks into '{collection_name}' "
+        f"({skipped} unchanged, {deleted} stale removed)"
+    )
+    return upserted
+
+
+def stream_pdf_into_local_index(
+    pdf_path,
+    embeddings,
+    collection_name="parallel_query",
+    path=None,
+    batch_size=64,
+    workers=None,
+    max_pending=None,
+    incremental=True,
+    sparse=True,
+    dtype="float16",
+):
+    """
+    The same streaming ingestion for the in-process backend: batches are
+    embedded on a worker pool and written, in order, into the
+    LocalVectorIndex that get_vector_store(backend="local") opens (default
+    `.local_index/<collection_name>`). No Qdrant server is involved.
+
+    Chunk ids and `incremental` / `sparse` behave as in
+    stream_pdf_into_qdrant. `dtype` only applies to a new index.
+    """
+    workers = workers or min(8, (os.cpu_count() or 1) + 2)
+    max_pending = max_pending or workers * 2
+
+    index = LocalVectorIndex.open(
+        embeddings, path or DEFAULT_INDEX_DIR / collection_name, dtype=dtype
+    )
+    sparse_index = BM25Index.load(collection_name) if sparse else None
+    seen = {}  # source -> chunk ids produced in this run
+    upserted = skipped = 0
+
+    def embed(ids, batch):
+        return ids, batch, embeddings.embed_documents([d.page_content for d in batch])
+
+    def write(future):
+        ids, batch, vectors = future.result()
+        index.add_vectors(vectors, batch, ids)
+        return len(ids)
+
+    # workers only embed; the index is written from this thread
+    pending = deque()
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        for batch in iter_batches(iter_chunks(pdf_path), batch_size):
+            batch_ids = [chunk_id(doc) for doc in batch]
+            for doc, doc_id in zip(batch, batch_ids):
+                seen.setdefault(doc.metadata.get("source"), set()).add(doc_id)
+            if sparse_index is not None:
+                sparse_index.add(batch_ids, [doc.page_content for doc in batch])
+
+            if incremental:
+                fresh = [
+                    (i, doc) for i, doc in zip(batch_ids, batch) if i not in index.rows
+                ]
+                skipped += len(batch) - len(fresh)
+                if not fresh:
+                    continue
+                batch_ids, batch = [i for i, _ in fresh], [doc for _, doc in fresh]
+
+            pending.append(pool.submit(embed, batch_ids, batch))
+            # backpressure: block parsing while workers catch up
+            while len(pending) >= max_pending or (pending and pending[0].done()):
+                upserted += write(pending.popleft())
+
+        while pending:
+            upserted += write(pending.popleft())
+
+    deleted = 0
+    if incremental:
+        stale = [
+            doc_id
+            for doc_id, _, metadata in index.docs
+            if metadata.get("source") in seen
+            and doc_id not in seen[metadata.get("source")]
+        ]
+        index.delete(stale)
+        deleted = len(stale)
+        if sparse_index is not None:
+            sparse_index.delete(stale)
+
+    if sparse_index is not None:
+        sparse_index.save()
+
+    print(
+        f"Added {upserted} chunks to local index '{collection_name}' "
+        f"({skipped} unchanged, {deleted} stale removed)"
+    )
+    return upserted
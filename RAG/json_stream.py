@@ -0,0 +1,211 @@
+import json
+import re
+
+
+class StringListStream:
+    """
+    Incremental extractor for a top-level JSON field holding a list of
+    strings, e.g. {"questions": ["...", "..."]} from a streamed completion.
+
+        stream = StringListStream("questions")
+        for delta in deltas:
+            for question in stream.feed(delta):
+                start_work(question)
+
+    `feed` returns the items that were completed by this chunk, so each one
+    can be acted on before the rest of the document has arrived.
+    """
+
+    ESCAPES = {
+        '"': '"',
+        "\\": "\\",
+        "/": "/",
+        "b": "\b",
+        "f": "\f",
+        "n": "\n",
+        "r": "\r",
+        "t": "\t",
+    }
+
+    def __init__(self, field: str):
+        self.field = field
+        self.depth = 0
+        self.in_string = False
+        self.escape = None  # None, "" after a backslash, or collected \u hex digits
+        self.high_surrogate = None
+        self.expect_key = False
+        self.last_key = None
+        self.in_target = False
+        self.string_is_key = False
+        self.buffer = []
+
+    def _decoded(self, ch):
+        """Feed one char of an escape sequence. Returns the decoded text, if complete."""
+        if self.escape == "":
+            if ch == "u":
+                self.escape = "u"
+                return None
+            self.escape = None
+            return self.ESCAPES.get(ch, ch)
+
+        self.escape += ch
+        if len(self.escape) < 5:  # "u" + 4 hex digits
+            return None
+
+        code = int(self.escape[1:], 16)
+        self.escape = None
+        if 0xD800 <= code < 0xDC00:
+            self.high_surrogate = code
+            return None
+        if 0xDC00 <= code < 0xE000 and self.high_surrogate is not None:
+            code = 0x10000 + ((self.high_surrogate - 0xD800) << 10) + (code - 0xDC00)
+        self.high_surrogate = None
+        return chr(code)
+
+    def feed(self, text: str) -> list:
+        completed = []
+        for ch in text:
+            if self.in_string:
+                if self.escape is not None:
+                    decoded = self._decoded(ch)
+                elif ch == "\\":
+                    self.escape = ""
+                    continue
+                elif ch == '"':
+                    self.in_string = False
+                    value = "".join(self.buffer)
+                    if self.string_is_key:
+                        self.last_key = value
+                    elif self.in_target and self.depth == 2:
+                        completed.append(value)
+                    continue
+                else:
+                    decoded = ch
+
+                if decoded is not None:
+                    self.buffer.append(decoded)
+                continue
+
+            if ch == '"':
+                self.in_string = True
+                self.string_is_key = self.depth == 1 and self.expect_key
+                self.buffer = []
+            elif ch in "{[":
+                self.depth += 1
+                if self.depth == 1:
+                    self.expect_key = ch == "{"
+                elif self.depth == 2 and ch == "[" and self.last_key == self.field:
+                    self.in_target = True
+            elif ch in "}]":
+                self.depth -= 1
+                if self.depth == 1:
+                    self.in_target = False
+            elif ch == ":" and self.depth == 1:
+                self.expect_key = False
+            elif ch == "," and self.depth == 1:
+                self.expect_key = True
+                self.last_key = None
+
+        return completed
+
+
+SCALAR_TAIL_RE = re.compile(r"[\w.+-]+$")
+
+
+class JsonRepair:
+    """
+    Tolerant, incremental parser for almost-JSON model output.
+
+    Text before the first `{`/`[` and after the top-level value closes is
+    ignored, trailing commas are dropped, and `parse()` closes whatever is
+    still open (strings, objects, arrays), so a truncated completion still
+    yields every member that arrived intact. A string cut off at the end is
+    kept as far as it got; a number or literal that runs into the end is
+    dropped with its member, since `12` may have been `123`.
+    """
+
+    def __init__(self):
+        self.out = []
+        self.stack = []  # open "{" / "["
+        self.cuts = []  # per open container: len(out) of its last complete member
+        self.in_string = False
+        self.escape = False
+        self.started = False
+        self.done = False
+
+    def _strip_trailing_comma(self):
+        while self.out and self.out[-1].isspace():
+            self.out.pop()
+        if self.out and self.out[-1] == ",":
+            self.out.pop()
+
+    def feed(self, text: str):
+        for ch in text:
+            if self.done:
+                break
+            if not self.started:
+                if ch not in "{[":
+                    continue
+                self.started = True
+
+            if self.in_string:
+                self.out.append(ch)
+                if self.escape:
+                    self.escape = False
+                elif ch == "\\":
+                    self.escape = True
+                elif ch == '"':
+                    self.in_string = False
+                continue
+
+            if ch == '"':
+                self.in_string = True
+                self.out.append(ch)
+            elif ch in "{[":
+                self.stack.append(ch)
+                self.out.append(ch)
+                self.cuts.append(len(self.out))
+            elif ch in "}]":
+                self._strip_trailing_comma()
+                opener = self.stack.pop()
+                self.cuts.pop()
+                self.out.append("}" if opener == "{" else "]")
+                self.done = not self.stack
+            elif ch == ",":
+                self._strip_trailing_comma()
+                self.cuts[-1] = len(self.out)
+                self.out.append(ch)
+            else:
+                self.out.append(ch)
+        return self
+
+    @staticmethod
+    def _closers(stack):
+        return "".join("}" if opener == "{" else "]" for opener in reversed(stack))
+
+    def parse(self):
+        """The value seen so far, closed off. Raises ValueError if there is none."""
+        if not self.started:
+            raise ValueError("no JSON object or array found")
+
+        text = "".join(self.out)
+        tail = None if self.in_string else SCALAR_TAIL_RE.search(text)
+        cut_scalar = tail is not None and tail.group() not in ("true", "false", "null")
+        if self.in_string:
+            text = (text[:-1] if self.escape else text) + '"'
+        text = text.rstrip().rstrip(",")
+        if text.endswith(":"):
+            text += "null"
+
+        # try the whole prefix first, then drop incomplete members innermost-first
+        candidates = [] if cut_scalar else [text + self._closers(self.stack)]
+        for depth in range(len(self.stack) - 1, -1, -1):
+            prefix = "".join(self.out[: self.cuts[depth]])
+            candidates.append(prefix + self._closers(self.stack[: depth + 1]))
+
+        for candidate in candidates:
+            try:
+                return json.loads(candidate)
+            except json.JSONDecodeError:
+                continue
+        raise ValueError("could not repair JSON")
@@ -0,0 +1,192 @@
+import hashlib
+import json
+import sqlite3
+import threading
+import time
+from pathlib import Path
+import numpy as np
+
+DEFAULT_CACHE_PATH = Path(__file__).parent / ".llm_cache" / "responses.sqlite"
+
+
+def _hash(payload):
+    return hashlib.sha256(
+        json.dumps(payload, sort_keys=True, ensure_ascii=False).encode("utf-8")
+    ).hexdigest()
+
+
+class LLMCache:
+    """
+    Two-tier response cache for chat completions, persisted in sqlite.
+
+    - exact tier: sha256 of the full request (model, messages, format, ...)
+    - semantic tier (needs `embeddings`): same request minus the user
+      message, and a user message whose embedding has cosine similarity
+      >= `similarity_threshold` with one asked before
+
+    Entries expire after `ttl` seconds; past `max_entries` the least
+    recently used ones are evicted.
+    """
+
+    def __init__(
+        self,
+        path=DEFAULT_CACHE_PATH,
+        embeddings=None,
+        similarity_threshold=0.95,
+        ttl=24 * 3600,
+        max_entries=10_000,
+    ):
+        self.embeddings = embeddings
+        self.similarity_threshold = similarity_threshold
+        self.ttl = ttl
+        self.max_entries = max_entries
+
+        Path(path).parent.mkdir(parents=True, exist_ok=True)
+        self.lock = threading.Lock()
+        self.db = sqlite3.connect(path, check_same_thread=False)
+        self.db.execute(
+            "CREATE TABLE IF NOT EXISTS responses ("
+            "key TEXT PRIMARY KEY, template TEXT NOT NULL, content TEXT NOT NULL, "
+            "vector BLOB, created REAL NOT NULL, last_used REAL NOT NULL)"
+        )
+        self.db.execute(
+            "CREATE INDEX IF NOT EXISTS responses_template ON responses (template)"
+        )
+        self.db.commit()
+
+        self.matrices = {}  # template -> (keys, normalised vectors), rebuilt lazily
+        self.stats = {"exact": 0, "semantic": 0, "miss": 0}
+
+    @staticmethod
+    def split_request(request):
+        """Return (exact key, template key, user message) for a request."""
+        messages = request.get("messages", [])
+        user_text = next(
+            (m["content"] for m in reversed(messages) if m.get("role") == "user"), None
+        )
+        template = {
+            **request,
+            "messages": [m for m in messages if m.get("role") != "user"],
+        }
+        return _hash(request), _hash(template), user_text
+
+    def _template_matrix(self, template, now):
+        cutoff = now - self.ttl
+        cached = self.matrices.get(template)
+        # rebuilt once its oldest entry has expired, so hits alone can't keep
+        # serving stale paraphrases
+        if cached is None or cached[2] <= cutoff:
+            rows = self.db.execute(
+                "SELECT key, vector, created FROM responses "
+                "WHERE template = ? AND vector IS NOT NULL AND created > ?",
+                (template, cutoff),
+            ).fetchall()
+            keys = [key for key, _, _ in rows]
+            if rows:
+                matrix = np.stack([np.frombuffer(blob, dtype=np.float32) for _, blob, _ in rows])
+                oldest = min(created for _, _, created in rows)
+            else:
+                matrix = np.empty((0, 0), dtype=np.float32)
+                oldest = float("inf")
+            self.matrices[template] = (keys, matrix, oldest)
+        return self.matrices[template]
+
+    def _embed(self, text):
+        vector = np.asarray(self.embeddings.embed_query(text), dtype=np.float32)
+        return vector / (np.linalg.norm(vector) or 1.0)
+
+    def get(self, request):
+        key, template, user_text = self.split_request(request)
+        now = time.time()
+
+        with self.lock:
+            row = self.db.execute(
+                "SELECT content FROM responses WHERE key = ? AND created > ?",
+                (key, now - self.ttl),
+            ).fetchone()
+            if row:
+                self.db.execute(
+                    "UPDATE responses SET last_used = ? WHERE key = ?", (now, key)
+                )
+                self.db.commit()
+                self.stats["exact"] += 1
+                return row[0]
+
+        if self.embeddings is None or not user_text:
+            self.stats["miss"] += 1
+            return None
+
+        vector = self._embed(user_text)
+        with self.lock:
+            keys, matrix, _ = self._template_matrix(template, now)
+            if len(keys):
+                similarities = matrix @ vector
+                best = int(np.argmax(similarities))
+                if similarities[best] >= self.similarity_threshold:
+                    row = self.db.execute(
+                        "SELECT content FROM responses WHERE key = ? AND created > ?",
+                        (keys[best], now - self.ttl),
+                    ).fetchone()
+                    if row:
+                        self.db.execute(
+                            "UPDATE responses SET last_used = ? WHERE key = ?",
+                            (now, keys[best]),
+                        )
+                        self.db.commit()
+                        self.stats["semantic"] += 1
+                        return row[0]
+
+        self.stats["miss"] += 1
+        return None
+
+    def put(self, request, content):
+        key, template, user_text = self.split_request(request)
+        vector = None
+        if self.embeddings is not None and user_text:
+            vector = self._embed(user_text).tobytes()
+
+        now = time.time()
+        with self.lock:
+            self.db.execute(
+                "INSERT OR REPLACE INTO responses VALUES (?, ?, ?, ?, ?, ?)",
+                (key, template, content, vector, now, now),
+            )
+            self.db.execute("DELETE FROM responses WHERE created <= ?", (now - self.ttl,))
+            self.db.execute(
+                "DELETE FROM responses WHERE key IN ("
+                "SELECT key FROM responses ORDER BY last_used DESC LIMIT -1 OFFSET ?)",
+                (self.max_entries,),
+            )
+            self.db.commit()
+            self.matrices.clear()
+
+
+_default_cache = None
+
+
+def init_llm_cache(embeddings=None, **kwargs):
+    """Set up the process-wide cache used by cached_completion."""
+    global _default_cache
+    _default_cache = LLMCache(embeddings=embeddings, **kwargs)
+    return _default_cache
+
+
+def get_llm_cache():
+    global _default_cache
+    if _default_cache is None:
+        _default_cache = LLMCache()
+    return _default_cache
+
+
+def cached_completion(client, cache=None, **request):
+    """client.chat.completions.create(**request), returning the message content."""
+    cache = cache or get_llm_cache()
+
+    content = cache.get(request)
+    if content is not None:
+        return content
+
+    res = client.chat.completions.create(**request)
+    content = res.choices[0].message.content
+    cache.put(request, content)
+    return content
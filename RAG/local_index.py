@@ -0,0 +1,373 @@
+import json
+import uuid
+from pathlib import Path
+from typing import Any, Iterable, List, Optional, Tuple
+import numpy as np
+from langchain_core.documents import Document
+from langchain_core.vectorstores import VectorStore
+
+try:
+    import hnswlib
+except ImportError:  # optional, only needed for hnsw=True
+    hnswlib = None
+
+DEFAULT_INDEX_DIR = Path(__file__).parent / ".local_index"
+DTYPES = {"float32": np.float32, "float16": np.float16, "int8": np.int8}
+
+
+class LocalVectorIndex(VectorStore):
+    """
+    In-process alternative to QdrantVectorStore.
+
+    Vectors are L2-normalised (cosine similarity, like our Qdrant
+    collections) and kept in a memory-mapped file as float32, float16 or
+    int8 with a per-vector scale. Search is exact: a batched matmul over
+    blocks of rows plus argpartition for the top-k. With `hnsw=True` and
+    hnswlib installed, an HNSW graph is used instead for approximate search.
+
+    Adding a document with an id that already exists overwrites it in place,
+    so the content-derived chunk ids from ingestion keep it idempotent.
+    """
+
+    def __init__(
+        self,
+        embedding,
+        path=DEFAULT_INDEX_DIR / "default",
+        dtype="float16",
+        hnsw=False,
+        block_size=65536,
+    ):
+        if dtype not in DTYPES:
+            raise ValueError(f"Unknown dtype {dtype!r}, expected one of {list(DTYPES)}")
+        if hnsw and hnswlib is None:
+            raise ImportError("hnsw=True needs hnswlib: pip install hnswlib")
+
+        self.embedding = embedding
+        self.path = Path(path)
+        self.path.mkdir(parents=True, exist_ok=True)
+        self.dtype = dtype
+        self.block_size = block_size
+
+        self.dim = None
+        self.count = 0
+        self.capacity = 0
+        self.vectors = None
+        self.scales = None
+        self.docs = []  # row -> (id, page_content, metadata)
+        self.rows = {}  # id -> row
+        self.hnsw = None
+        self.use_hnsw = hnsw
+        self.saved_docs = 0  # docs.jsonl is append-only unless a doc is overwritten
+        self.rewrite_docs = False
+
+        self._load()
+
+    @property
+    def embeddings(self):
+        return self.embedding
+
+    # --- storage -------------------------------------------------------------
+
+    def _open(self, capacity):
+        vectors_path = self.path / "vectors.bin"
+        scales_path = self.path / "scales.f32"
+        shape = (capacity, self.dim)
+        itemsize = np.dtype(DTYPES[self.dtype]).itemsize
+
+        # np.memmap can't grow, so extend the files and map them again
+        for file, size in (
+            (vectors_path, capacity * self.dim * itemsize),
+            (scales_path, capacity * 4),
+        ):
+            with open(file, "ab") as f:
+                f.truncate(max(size, f.tell()))
+
+        self.vectors = np.memmap(
+            vectors_path, dtype=DTYPES[self.dtype], mode="r+", shape=shape
+        )
+        self.scales = np.memmap(
+            scales_path, dtype=np.float32, mode="r+", shape=(capacity,)
+        )
+        self.capacity = capacity
+
+    def _load(self):
+        meta_path = self.path / "meta.json"
+        if not meta_path.exists():
+            return
+
+        meta = json.loads(meta_path.read_text())
+        if meta["dtype"] != self.dtype:
+            raise ValueError(
+                f"{self.path} was built as {meta['dtype']}, not {self.dtype}"
+            )
+
+        self.dim = meta["dim"]
+        self.count = meta["count"]
+        self._open(max(meta["capacity"], 1))
+        with open(self.path / "docs.jsonl", encoding="utf-8") as f:
+            for row, line in enumerate(f):
+                doc_id, content, metadata = json.loads(line)
+                self.docs.append((doc_id, content, metadata))
+                self.rows[doc_id] = row
+        self.saved_docs = len(self.docs)
+
+        if self.use_hnsw:
+            self._build_hnsw()
+
+    def save(self):
+        if self.vectors is None:
+            return
+        self.vectors.flush()
+        self.scales.flush()
+        start = 0 if self.rewrite_docs else self.saved_docs
+        with open(
+            self.path / "docs.jsonl", "w" if start == 0 else "a", encoding="utf-8"
+        ) as f:
+            for doc in self.docs[start:]:
+                f.write(json.dumps(doc, ensure_ascii=False) + "\n")
+        self.saved_docs = len(self.docs)
+        self.rewrite_docs = False
+        (self.path / "meta.json").write_text(
+            json.dumps(
+                {
+                    "dim": self.dim,
+                    "count": self.count,
+                    "capacity": self.capacity,
+                    "dtype": self.dtype,
+                }
+            )
+        )
+
+    def _encode(self, matrix):
+        """Normalise and quantise. Returns (stored rows, per-row scales)."""
+        matrix = np.asarray(matrix, dtype=np.float32)
+        norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+        matrix = matrix / np.where(norms == 0, 1, norms)
+
+        if self.dtype != "int8":
+            return matrix.astype(DTYPES[self.dtype]), np.ones(
+                len(matrix), dtype=np.float32
+            )
+
+        scales = np.abs(matrix).max(axis=1) / 127
+        scales[scales == 0] = 1
+        quantised = np.round(matrix / scales[:, None]).astype(np.int8)
+        return quantised, scales.astype(np.float32)
+
+    def add_vectors(self, vectors, documents: List[Document], ids: List[str]):
+        vectors = np.asarray(vectors, dtype=np.float32)
+        if self.dim is None:
+            self.dim = vectors.shape[1]
+        if vectors.shape[1] != self.dim:
+            raise ValueError(f"Expected {self.dim}-dim vectors, got {vectors.shape[1]}")
+
+        rows = []
+        for doc_id, doc in zip(ids, documents):
+            entry = (doc_id, doc.page_content, doc.metadata)
+            if doc_id in self.rows:
+                self.docs[self.rows[doc_id]] = entry
+                self.rewrite_docs = (
+                    self.rows[doc_id] < self.saved_docs or self.rewrite_docs
+                )
+            else:
+                self.rows[doc_id] = len(self.docs)
+                self.docs.append(entry)
+            rows.append(self.rows[doc_id])
+
+        needed = len(self.docs)
+        if needed > self.capacity:
+            self._open(max(needed, self.capacity * 2, 1024))
+
+        stored, scales = self._encode(vectors)
+        rows = np.asarray(rows)
+        self.vectors[rows] = stored
+        self.scales[rows] = scales
+        self.count = needed
+
+        if self.hnsw is not None:
+            if needed > self.hnsw.get_max_elements():
+                self.hnsw.resize_index(max(needed, self.hnsw.get_max_elements() * 2))
+            self.hnsw.add_items(self._decode(rows), rows)
+        elif self.use_hnsw:
+            self._build_hnsw()
+
+        self.save()
+        return list(ids)
+
+    def _decode(self, rows):
+        return self.vectors[rows].astype(np.float32) * self.scales[rows, None]
+
+    def _build_hnsw(self, m=16, ef_construction=200):
+        self.hnsw = hnswlib.Index(space="ip", dim=self.dim)
+        self.hnsw.init_index(
+            max_elements=max(self.count, 1024), M=m, ef_construction=ef_construction
+        )
+        for start in range(0, self.count, self.block_size):
+            rows = np.arange(start, min(start + self.block_size, self.count))
+            self.hnsw.add_items(self._decode(rows), rows)
+        self.hnsw.set_ef(max(64, 2 * m))
+
+    # --- search --------------------------------------------------------------
+
+    def search_vectors(self, queries, k=4) -> List[List[Tuple[int, float]]]:
+        """Top-k (row, cosine score) for each query vector."""
+        queries = np.asarray(queries, dtype=np.float32)
+        if queries.ndim == 1:
+            queries = queries[None, :]
+        queries = queries / np.linalg.norm(queries, axis=1, keepdims=True)
+        if self.count == 0:
+            return [[] for _ in queries]
+        k = min(k, self.count)
+
+        if self.hnsw is not None:
+            labels, distances = self.hnsw.knn_query(queries, k=k)
+            return [
+                [(int(row), float(1 - dist)) for row, dist in zip(l, d)]
+                for l, d in zip(labels, distances)
+            ]
+
+        best_rows = np.empty((len(queries), 0), dtype=np.int64)
+        best_scores = np.empty((len(queries), 0), dtype=np.float32)
+        for start in range(0, self.count, self.block_size):
+            stop = min(start + self.block_size, self.count)
+            block = self.vectors[start:stop]
+            scores = (queries @ block.astype(np.float32).T) * self.scales[start:stop]
+
+            # keep only this block's top-k, then merge with the running best
+            top = np.argpartition(-scores, min(k, stop - start) - 1, axis=1)[:, :k]
+            best_rows = np.concatenate([best_rows, top + start], axis=1)
+            best_scores = np.concatenate(
+                [best_scores, np.take_along_axis(scores, top, axis=1)], axis=1
+            )
+
+        order = np.argsort(-best_scores, axis=1)[:, :k]
+        rows = np.take_along_axis(best_rows, order, axis=1)
+        scores = np.take_along_axis(best_scores, order, axis=1)
+        return [
+            [(int(r), float(s)) for r, s in zip(row_list, score_list)]
+            for row_list, score_list in zip(rows, scores)
+        ]
+
+    def _document(self, row):
+        doc_id, content, metadata = self.docs[row]
+        return Document(page_content=content, metadata={**metadata, "_id": doc_id})
+
+    def get_by_ids(self, ids, /) -> List[Document]:
+        return [self._document(self.rows[i]) for i in ids if i in self.rows]
+
+    def batch_search(self, queries: List[str], k=4, with_scores=False):
+        """Same contract as retrievers.batch_similarity_search."""
+        vectors = self.embedding.embed_documents(list(queries))
+        results = []
+        for hits in self.search_vectors(vectors, k):
+            docs = [(self._document(row), score) for row, score in hits]
+            results.append(docs if with_scores else [doc for doc, _ in docs])
+        return results
+
+    # --- VectorStore interface ----------------------------------------------
+
+    def delete(self, ids: Optional[List[str]] = None, **kwargs: Any) -> bool:
+        """Remove documents; the last row is moved into each freed row."""
+        rows = sorted(
+            (self.rows.pop(i) for i in ids or [] if i in self.rows), reverse=True
+        )
+        if not rows:
+            return False
+
+        # descending order, so the last row is never one still waiting to go
+        for row in rows:
+            last = len(self.docs) - 1
+            if row != last:
+                self.vectors[row] = self.vectors[last]
+                self.scales[row] = self.scales[last]
+                self.docs[row] = self.docs[last]
+                self.rows[self.docs[row][0]] = row
+            self.docs.pop()
+
+        self.count = len(self.docs)
+        self.rewrite_docs = True
+        if self.use_hnsw:
+            self._build_hnsw()
+        self.save()
+        return True
+
+    def add_texts(
+        self,
+        texts: Iterable[str],
+        metadatas: Optional[List[dict]] = None,
+        ids: Optional[List[str]] = None,
+        **kwargs: Any,
+    ) -> List[str]:
+        texts = list(texts)
+        metadatas = metadatas or [{} for _ in texts]
+        ids = ids or [uuid.uuid4().hex for _ in texts]
+        docs = [Document(page_content=t, metadata=m) for t, m in zip(texts, metadatas)]
+        return self.add_vectors(self.embedding.embed_documents(texts), docs, ids)
+
+    def similarity_search_by_vector(
+        self, embedding: List[float], k: int = 4, **kwargs: Any
+    ) -> List[Document]:
+        return [self._document(row) for row, _ in self.search_vectors(embedding, k)[0]]
+
+    def similarity_search_with_score(
+        self, query: str, k: int = 4, **kwargs: Any
+    ) -> List[Tuple[Document, float]]:
+        vector = self.embedding.embed_query(query)
+        return [
+            (self._document(row), score)
+            for row, score in self.search_vectors(vector, k)[0]
+        ]
+
+    def similarity_search(
+        self, query: str, k: int = 4, **kwargs: Any
+    ) -> List[Document]:
+        return [doc for doc, _ in self.similarity_search_with_score(query, k)]
+
+    @classmethod
+    def from_texts(cls, texts, embedding, metadatas=None, ids=None, **kwargs):
+        index = cls(embedding, **kwargs)
+        index.add_texts(texts, metadatas, ids)
+        return index
+
+    @classmethod
+    def open(cls, embedding, path, dtype="float16", **kwargs):
+        """Open the index at `path` with the dtype it was built with (`dtype` is for new ones)."""
+        meta_path = Path(path) / "meta.json"
+        if meta_path.exists():
+            dtype = json.loads(meta_path.read_text())["dtype"]
+        return cls(embedding, path=path, dtype=dtype, **kwargs)
+
+    @classmethod
+    def from_qdrant(
+        cls, client, collection_name, embedding, path=None, batch_size=1000, **kwargs
+    ):
+        """
+        Copy an existing Qdrant collection (vectors + payloads) into a local
+        index at `path` (default `.local_index/<collection_name>`).
+        """
+        index = cls(
+            embedding, path=path or DEFAULT_INDEX_DIR / collection_name, **kwargs
+        )
+        offset = None
+        while True:
+            points, offset = client.scroll(
+                collection_name=collection_name,
+                limit=batch_size,
+                offset=offset,
+                with_payload=True,
+                with_vectors=True,
+            )
+            if points:
+                docs = [
+                    Document(
+                        page_content=(p.payload or {}).get("page_content", ""),
+                        metadata=(p.payload or {}).get("metadata") or {},
+                    )
+                    for p in points
+                ]
+                index.add_vectors(
+                    [p.vector for p in points], docs, [str(p.id) for p in points]
+                )
+            if offset is None:
+                break
+        return index
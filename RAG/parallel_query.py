@@ -1,13 +1,18 @@
 from pathlib import Path
-from langchain_community.document_loaders import PyPDFLoader
-from langchain_text_splitters import RecursiveCharacterTextSplitter
 from langchain_openai import OpenAIEmbeddings
-from langchain_qdrant import QdrantVectorStore
 from openai import OpenAI
 from dotenv import load_dotenv
 import json
 import os
 from typing import List
+from ingestion import stream_pdf_into_qdrant
+from embedding_cache import CachedEmbeddings
+from llm_cache import cached_completion, init_llm_cache
+from retrievers import get_vector_store, batch_similarity_search
+from fusion import chunk_key
+from rerank import load_reranker
+from context_builder import DEFAULT_CONTEXT_TOKENS, build_context
+from answering import answer_from_context
 
 
 def init_clients():
@@ -15,35 +20,24 @@ def init_clients():
     load_dotenv()
     openai_api_key = os.getenv("OPENAI_API_KEY")
     client = OpenAI()
-    embeddings = OpenAIEmbeddings(
-        model="text-embedding-3-large", api_key=openai_api_key
+    embeddings = CachedEmbeddings(
+        OpenAIEmbeddings(model="text-embedding-3-large", api_key=openai_api_key)
     )
+    init_llm_cache(embeddings)
     print("clients ready!")
     return client, embeddings
 
 
 def inject_pdf(pdf_path, embeddings):
     print("injecting pdf..")
-    loader = PyPDFLoader(file_path=pdf_path)
 
-    docs = loader.load()
-
-    text_splitter = RecursiveCharacterTextSplitter(
-        chunk_size=1000,
-        chunk_overlap=200,
-    )
-
-    split_docs = text_splitter.split_documents(documents=docs)
-
-    vector_store = QdrantVectorStore.from_documents(
-        documents=[],
-        url="http://localhost:6333",
+    stream_pdf_into_qdrant(
+        pdf_path,
+        embeddings,
         collection_name="parallel_query",
-        embedding=embeddings,
+        url="http://localhost:6333",
     )
 
-    vector_store.add_documents(documents=split_docs)
-
     print("PDF Injection Compelete!")
 
 
@@ -55,7 +49,8 @@ def rewrite_query(client, user_query) -> List[str]:
     Return the output strictly as a JSON list of strings, nothing else.
     """
 
-    res = client.chat.completions.create(
+    raw_output = cached_completion(
+        client,
         model="gpt-4o-mini",
         messages=[
             {"role": "system", "content": SYSTEM_PROMPT},
@@ -82,7 +77,6 @@ def rewrite_query(client, user_query) -> List[str]:
         },
     )
 
-    raw_output = res.choices[0].message.content
     rewrites = json.loads(raw_output)
 
     user_query_list = rewrites.get("questions")
@@ -94,19 +88,20 @@ def rewrite_query(client, user_query) -> List[str]:
     return user_query_list
 
 
-def retrieve_unique_docs(embeddings, query_list):
+def retrieve_unique_docs(embeddings, query_list, user_query=None, top_n=4):
     print("Retrieving Relevant Unique Chunks..")
-    retriever = QdrantVectorStore.from_existing_collection(
-        url="http://localhost:6333",
-        collection_name="parallel_query",
-        embedding=embeddings,
-    )
+    retriever = get_vector_store(embeddings, collection_name="parallel_query")
 
     all_query_pages = []  # list of sets, one per query
     all_chunks = []  # store chunks across queries
 
-    for i, query in enumerate(query_list):
-        chunks = retriever.similarity_search(query=query)
+    # with a reranker we can afford to retrieve wide and keep the best few
+    reranker = load_reranker() if user_query else None
+
+    # all rewrites are embedded and searched in a single round trip
+    results = batch_similarity_search(retriever, query_list, k=50 if reranker else 4)
+
+    for i, (query, chunks) in enumerate(zip(query_list, results)):
         pages = {doc.metadata.get("page") for doc in chunks}
 
         all_query_pages.append(pages)
@@ -132,18 +127,24 @@ def retrieve_unique_docs(embeddings, query_list):
         doc for doc in all_chunks if doc.metadata.get("page") in common_pages
     ]
 
+    # with a reranker, score every retrieved chunk instead of intersecting pages
+    if reranker:
+        seen = {}
+        for doc in all_chunks:
+            seen.setdefault(chunk_key(doc), doc)
+        reranked = reranker.rerank(user_query, list(seen.values()), top_n=top_n)
+        print(
+            "Reranked:", [(doc.metadata.get("page"), score) for doc, score in reranked]
+        )
+        unique_chunks = [doc for doc, _ in reranked]
+
     # print("Unique Chunks:", unique_chunks)
 
     return unique_chunks
 
 
-def format_context(docs):
-    context_blocks = []
-    for i, doc in enumerate(docs, start=1):
-        page = doc.metadata.get("page", "unknown")
-        snippet = doc.page_content.strip().replace("\n", " ")
-        context_blocks.append(f"doc_{i} (page {page}): {snippet}...")
-    return "\n\n".join(context_blocks)
+def format_context(docs, max_tokens=DEFAULT_CONTEXT_TOKENS):
+    return build_context(docs, max_tokens=max_tokens)
 
 
 def get_answers(relevant_chunks, user_query, client):
@@ -152,53 +153,7 @@ def get_answers(relevant_chunks, user_query, client):
 
     # print("context given to context", context)
 
-    SYSTEM_PROMPT = f"""
-    You are an expert AI assistant. Base all answers only on the provided Context.
-
-    Return a single JSON object (no extra text) using this schema:
-    {{
-    "stage": "one of: analyse, considerations, validation, result, output",
-    "content": "string (concise, user-facing; max 150 words)",
-    "sources": ["optional short references to the provided context, e.g. 'doc_3: paragraph 2'"],
-    "status": "final" or "continue"
-    }}
-
-    Behavior rules:
-    - "analyse": 1–2 sentence summary of what the user asked and the relevant context to check.
-    - "considerations": up to 3 short bullets (each 1 sentence) listing factors considered — user-facing, not private reasoning.
-    - "validation": one short sentence indicating if the chosen interpretation aligns with the context/sources.
-    - "result": proper answer summary.
-    - "output": the final user-facing answer, clear and actionable (this is what should be shown to the user).
-    - If more context or clarification is needed, set "status":"continue". Otherwise "status":"final".
-    - Always return strictly valid JSON (no surrounding explanation text).
-    - Do not answer on your own, only answer from the context.
-    - If you don’t find the answer in context, return:  {{ "status" : "final" , "content": "I dont know bruv" }}
-
-
-    Context: {context}
-    """
-
-    messages = [
-        {"role": "system", "content": SYSTEM_PROMPT},
-        {"role": "user", "content": user_query},
-    ]
-
-    for attempt in range(3):
-        resp = client.chat.completions.create(
-            model="gpt-4o-mini",
-            messages=messages,
-            temperature=0,
-        )
-        try:
-            # print("response", resp)
-            parsed = json.loads(resp.choices[0].message.content)
-        except json.JSONDecodeError:
-            print(f"⚠️ Invalid JSON at attempt {attempt+1}, retrying...")
-            continue
-
-        if parsed.get("status") == "final":
-            print(f"✅ Final answer: {parsed['content']}")
-            break
+    return answer_from_context(client, context, user_query)
 
 
 def main():
@@ -214,7 +169,7 @@ def main():
 
     query_list = rewrite_query(client, user_query)
 
-    unique_chunk_list = retrieve_unique_docs(embeddings, query_list)
+    unique_chunk_list = retrieve_unique_docs(embeddings, query_list, user_query)
 
     get_answers(unique_chunk_list, user_query, client)
 
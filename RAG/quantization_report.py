@@ -0,0 +1,116 @@
+import os
+import time
+from pathlib import Path
+import numpy as np
+from dotenv import load_dotenv
+from langchain_openai import OpenAIEmbeddings
+from qdrant_client.http import models
+from embedding_cache import CachedEmbeddings
+from ingestion import stream_pdf_into_qdrant
+from retrievers import get_qdrant_client, rescore_params
+
+QUERIES = [
+    "What is a queue?",
+    "How does a stack differ from a queue?",
+    "Explain recursion with an example",
+    "What is a linked list used for?",
+    "Describe binary search",
+    "What is the time complexity of sorting?",
+]
+
+# text-embedding-3-* accept a `dimensions` parameter (Matryoshka truncation)
+DIMENSIONS = [3072, 1024, 256]
+QUANTIZATIONS = [None, "scalar", "binary"]
+OVERSAMPLING = {None: None, "scalar": 2.0, "binary": 3.0}
+
+
+def bytes_per_vector(dims, quantization):
+    """RAM per vector for search (full-precision vectors live on disk if quantised)."""
+    if quantization == "scalar":
+        return dims
+    if quantization == "binary":
+        return dims // 8
+    return dims * 4
+
+
+def search_ids(client, collection_name, vectors, k, params):
+    started = time.perf_counter()
+    responses = [
+        client.query_points(
+            collection_name=collection_name, query=v, limit=k, search_params=params
+        )
+        for v in vectors
+    ]
+    elapsed_ms = (time.perf_counter() - started) / len(vectors) * 1000
+    return [[str(p.id) for p in r.points] for r in responses], elapsed_ms
+
+
+def main(k=10, keep_collections=False):
+    load_dotenv()
+    openai_api_key = os.getenv("OPENAI_API_KEY")
+    pdf_path = Path(__file__).parent / "rag_practice.pdf"
+    client = get_qdrant_client()
+
+    truth = None
+    rows = []
+    for dims in DIMENSIONS:
+        embeddings = CachedEmbeddings(
+            OpenAIEmbeddings(
+                model="text-embedding-3-large",
+                api_key=openai_api_key,
+                dimensions=None if dims == 3072 else dims,
+            )
+        )
+        vectors = embeddings.embed_documents(QUERIES)
+
+        for quantization in QUANTIZATIONS:
+            collection_name = f"quant_report_{dims}_{quantization or 'float'}"
+            # chunk ids are content-derived, so every collection has the same ids;
+            # wait=True so every point is searchable before we query it
+            stream_pdf_into_qdrant(
+                pdf_path,
+                embeddings,
+                collection_name=collection_name,
+                quantization=quantization,
+                sparse=False,
+                wait=True,
+            )
+
+            if truth is None:
+                # exact full-precision search is the reference for recall
+                truth, _ = search_ids(
+                    client,
+                    collection_name,
+                    vectors,
+                    k,
+                    models.SearchParams(exact=True),
+                )
+
+            oversampling = OVERSAMPLING[quantization]
+            params = rescore_params(oversampling) if oversampling else None
+            found, latency_ms = search_ids(client, collection_name, vectors, k, params)
+            # throwaway; a rerun re-embeds from CachedEmbeddings, not the API
+            if not keep_collections:
+                client.delete_collection(collection_name)
+            recall = np.mean(
+                [len(set(t) & set(f)) / len(t) for t, f in zip(truth, found)]
+            )
+            rows.append(
+                (
+                    dims,
+                    quantization or "float32",
+                    bytes_per_vector(dims, quantization),
+                    recall,
+                    latency_ms,
+                )
+            )
+
+    print(
+        f"\n{'dims':>6} {'storage':>8} {'bytes/vec':>10} {'recall@' + str(k):>10} {'ms/query':>9}"
+    )
+    for dims, storage, size, recall, latency_ms in rows:
+        print(f"{dims:>6} {storage:>8} {size:>10} {recall:>10.3f} {latency_ms:>9.2f}")
+
+
+if __name__ == "__main__":
+    main()
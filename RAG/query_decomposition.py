@@ -1,13 +1,19 @@
+import asyncio
+import time
+from functools import lru_cache
 from pathlib import Path
-from langchain_community.document_loaders import PyPDFLoader
-from langchain_text_splitters import RecursiveCharacterTextSplitter
 from langchain_openai import OpenAIEmbeddings
-from langchain_qdrant import QdrantVectorStore
-from openai import OpenAI
+from openai import AsyncOpenAI, OpenAI
 from dotenv import load_dotenv
 import json
 import os
 from typing import List
+from ingestion import stream_pdf_into_qdrant
+from embedding_cache import CachedEmbeddings
+from llm_cache import cached_completion, init_llm_cache
+from retrievers import get_vector_store, batch_similarity_search
+from context_builder import DEFAULT_CONTEXT_TOKENS, build_context
+from answering import answer_from_context, report_cache_usage
 
 
 def init_clients():
@@ -15,35 +21,24 @@ def init_clients():
     load_dotenv()
     openai_api_key = os.getenv("OPENAI_API_KEY")
     client = OpenAI()
-    embeddings = OpenAIEmbeddings(
-        model="text-embedding-3-large", api_key=openai_api_key
+    embeddings = CachedEmbeddings(
+        OpenAIEmbeddings(model="text-embedding-3-large", api_key=openai_api_key)
     )
+    init_llm_cache(embeddings)
     print("clients ready!")
     return client, embeddings
 
 
 def inject_pdf(pdf_path, embeddings):
     print("injecting pdf..")
-    loader = PyPDFLoader(file_path=pdf_path)
 
-    docs = loader.load()
-
-    text_splitter = RecursiveCharacterTextSplitter(
-        chunk_size=1000,
-        chunk_overlap=200,
-    )
-
-    split_docs = text_splitter.split_documents(documents=docs)
-
-    vector_store = QdrantVectorStore.from_documents(
-        documents=[],
-        url="http://localhost:6333",
+    stream_pdf_into_qdrant(
+        pdf_path,
+        embeddings,
         collection_name="parallel_query",
-        embedding=embeddings,
+        url="http://localhost:6333",
     )
 
-    vector_store.add_documents(documents=split_docs)
-
     print("PDF Injection Compelete!")
 
 
@@ -55,7 +50,8 @@ def decompose_query(client, user_query) -> List[str]:
     Return as a JSON array of strings.
     """
 
-    res = client.chat.completions.create(
+    raw_output = cached_completion(
+        client,
         model="gpt-4o-mini",
         messages=[
             {"role": "system", "content": SYSTEM_PROMPT},
@@ -82,7 +78,6 @@ def decompose_query(client, user_query) -> List[str]:
         },
     )
 
-    raw_output = res.choices[0].message.content
     rewrites = json.loads(raw_output)
 
     user_query_list = rewrites.get("questions")
@@ -95,15 +90,12 @@ def decompose_query(client, user_query) -> List[str]:
 
 
 def retrieve_and_merge(embeddings, query_list):
-    retriever = QdrantVectorStore.from_existing_collection(
-        url="http://localhost:6333",
-        collection_name="parallel_query",
-        embedding=embeddings,
-    )
+    retriever = get_vector_store(embeddings, collection_name="parallel_query")
+
+    results = batch_similarity_search(retriever, query_list, k=5)
 
     all_chunks = []
-    for i, query in enumerate(query_list):
-        chunks = retriever.similarity_search(query=query, k=5)
+    for i, (query, chunks) in enumerate(zip(query_list, results)):
         all_chunks.extend(chunks)
 
         print(f"\n--- Retrieval for sub-query {i+1}: {query} ---")
@@ -117,79 +109,210 @@ def run_strategy_A(client, embeddings, user_query):
     print("\n=== Strategy A: Retrieve separately, merge later ===")
     query_list = decompose_query(client, user_query)
     merged_chunks = retrieve_and_merge(embeddings, query_list)
-    get_answers(merged_chunks, user_query, client)
+    return get_answers(merged_chunks, user_query, client)
 
 
-def run_strategy_B(client, embeddings, user_query):
-    print("\n=== Strategy B: Sequential answering ===")
-    query_list = decompose_query(client, user_query)
+def decompose_query_dag(client, user_query):
+    SYSTEM_PROMPT = """
+    You are a query decomposition assistant.
+    Break down the user query into the smallest sub-questions that together
+    can fully answer the query. Keep sub-questions independent wherever
+    possible; if one genuinely needs the answer of an earlier one, list the
+    earlier sub-question's 0-based index in "depends_on".
+    """
 
-    retriever = QdrantVectorStore.from_existing_collection(
-        url="http://localhost:6333",
-        collection_name="parallel_query",
-        embedding=embeddings,
+    raw_output = cached_completion(
+        client,
+        model="gpt-4o-mini",
+        messages=[
+            {"role": "system", "content": SYSTEM_PROMPT},
+            {"role": "user", "content": user_query},
+        ],
+        response_format={
+            "type": "json_schema",
+            "json_schema": {
+                "name": "decomposition_dag_schema",
+                "schema": {
+                    "type": "object",
+                    "properties": {
+                        "sub_questions": {
+                            "type": "array",
+                            "items": {
+                                "type": "object",
+                                "properties": {
+                                    "question": {"type": "string"},
+                                    "depends_on": {
+                                        "type": "array",
+                                        "items": {"type": "integer"},
+                                    },
+                                },
+                                "required": ["question", "depends_on"],
+                                "additionalProperties": False,
+                            },
+                            "minItems": 1,
+                            "maxItems": 5,
+                        }
+                    },
+                    "required": ["sub_questions"],
+                    "additionalProperties": False,
+                },
+            },
+        },
     )
 
-    sub_answers = []
-    for i, query in enumerate(query_list):
-        chunks = retriever.similarity_search(query=query, k=5)
-        context = format_context(chunks)
+    sub_questions = json.loads(raw_output)["sub_questions"]
 
-        SYSTEM_PROMPT = f"""
-        You are an expert assistant. Answer only using the provided Context.
+    # only earlier sub-questions can be dependencies, which keeps it acyclic
+    for i, node in enumerate(sub_questions):
+        node["depends_on"] = sorted({j for j in node["depends_on"] if 0 <= j < i})
 
-        Return strictly JSON:
-        {{
-          "sub_query": "{query}",
-          "answer": "short answer from context or 'I don’t know'",
-          "sources": ["doc_x references if any"]
-        }}
+    print(f"Original User Query: {user_query}")
+    print("Sub-questions:")
+    for i, node in enumerate(sub_questions):
+        print(f"{i}. {node['question']} (depends on {node['depends_on'] or '-'})")
+
+    return sub_questions
+
+
+SUB_ANSWER_INSTRUCTIONS = """
+You are an expert assistant. Answer the user's sub-question only using the provided Context.
+
+Return strictly JSON:
+{
+  "sub_query": "the sub-question, verbatim",
+  "answer": "short answer from context or 'I don’t know'",
+  "sources": ["doc_x references if any"]
+}
+"""
+
+SYNTHESIS_INSTRUCTIONS = """
+Synthesize a final user-facing answer from the sub-answers the user provides.
+
+Return strictly JSON:
+{
+  "final_answer": "clear, concise synthesis in <=200 words"
+}
+"""
+
+
+async def answer_sub_query(client, retriever, query, earlier_answers):
+    chunks = await asyncio.to_thread(retriever.similarity_search, query=query, k=5)
+    context = format_context(chunks)
+
+    # static instructions first; too short to be cached on their own (see
+    # CACHE_MIN_TOKENS), so only a repeated sub-question reports cached tokens
+    messages = [{"role": "system", "content": SUB_ANSWER_INSTRUCTIONS}]
+    if earlier_answers:
+        messages.append(
+            {
+                "role": "system",
+                "content": f"Answers to earlier sub-questions: {json.dumps(earlier_answers)}",
+            }
+        )
+    messages.append({"role": "system", "content": f"Context:\n{context}"})
+    messages.append({"role": "user", "content": query})
 
-        Context: {context}
-        """
+    resp = await client.chat.completions.create(
+        model="gpt-4o-mini",
+        messages=messages,
+        temperature=0,
+    )
+    report_cache_usage(resp, label="sub-question")
+
+    try:
+        return json.loads(resp.choices[0].message.content)
+    except json.JSONDecodeError:
+        return {"sub_query": query, "answer": "Invalid JSON", "sources": []}
 
-        resp = client.chat.completions.create(
-            model="gpt-4o-mini",
-            messages=[{"role": "system", "content": SYSTEM_PROMPT}],
-            temperature=0,
-        )
 
-        try:
-            parsed = json.loads(resp.choices[0].message.content)
-        except json.JSONDecodeError:
-            parsed = {"sub_query": query, "answer": "Invalid JSON", "sources": []}
+class AsyncRuntime:
+    """
+    One AsyncOpenAI client and the event loop it runs on. The client's
+    connections belong to the loop that opened them, so reusing it across
+    calls means reusing the loop too, instead of a new asyncio.run() each time.
+    """
 
-        sub_answers.append(parsed)
+    def __init__(self):
+        self.loop = asyncio.new_event_loop()
+        self.client = AsyncOpenAI()
+
+    def run(self, coro):
+        return self.loop.run_until_complete(coro)
 
-    # merge all sub-answers into a final synthesis
-    final_prompt = f"""
-    Synthesize a final user-facing answer from the following sub-answers:
 
-    {json.dumps(sub_answers, indent=2)}
+@lru_cache(maxsize=None)
+def get_async_runtime() -> AsyncRuntime:
+    return AsyncRuntime()
 
-    Return strictly JSON:
-    {{
-      "final_answer": "clear, concise synthesis in <=200 words"
-    }}
+
+async def run_sub_query_dag(
+    client, retriever, sub_questions, max_concurrency=4, timeout=30
+):
+    """
+    Answer sub-questions as a DAG: each one waits only for its own
+    dependencies, at most `max_concurrency` run at once and each gets
+    `timeout` seconds before it is answered as timed out.
     """
+    semaphore = asyncio.Semaphore(max_concurrency)
+    tasks = []
+
+    async def run(i):
+        node = sub_questions[i]
+        # wait for dependencies before taking a slot, so waiting never blocks
+        earlier = [await tasks[j] for j in node["depends_on"]]
+        async with semaphore:
+            started = time.perf_counter()
+            try:
+                answer = await asyncio.wait_for(
+                    answer_sub_query(client, retriever, node["question"], earlier),
+                    timeout,
+                )
+            except asyncio.TimeoutError:
+                answer = {
+                    "sub_query": node["question"],
+                    "answer": "Timed out",
+                    "sources": [],
+                }
+            print(f"sub-question {i} done in {time.perf_counter() - started:.2f}s")
+            return answer
+
+    # dependencies always have a lower index, so their tasks exist already
+    for i in range(len(sub_questions)):
+        tasks.append(asyncio.create_task(run(i)))
+    return await asyncio.gather(*tasks)
+
+
+def run_strategy_B(client, embeddings, user_query, runtime=None):
+    print("\n=== Strategy B: Sub-questions as a concurrent DAG ===")
+    sub_questions = decompose_query_dag(client, user_query)
+
+    retriever = get_vector_store(embeddings, collection_name="parallel_query")
+    runtime = runtime or get_async_runtime()
+
+    started = time.perf_counter()
+    sub_answers = runtime.run(
+        run_sub_query_dag(runtime.client, retriever, sub_questions)
+    )
+    print(f"all sub-questions answered in {time.perf_counter() - started:.2f}s")
 
+    # merge all sub-answers into a final synthesis
     resp = client.chat.completions.create(
         model="gpt-4o-mini",
-        messages=[{"role": "system", "content": final_prompt}],
+        messages=[
+            {"role": "system", "content": SYNTHESIS_INSTRUCTIONS},
+            {"role": "user", "content": json.dumps(sub_answers, indent=2)},
+        ],
         temperature=0,
     )
+    report_cache_usage(resp, label="synthesis")
 
     final = json.loads(resp.choices[0].message.content)
     print("✅ Final synthesized answer:", final["final_answer"])
+    return final
 
 
-def format_context(docs):
-    context_blocks = []
-    for i, doc in enumerate(docs, start=1):
-        page = doc.metadata.get("page", "unknown")
-        snippet = doc.page_content.strip().replace("\n", " ")
-        context_blocks.append(f"doc_{i} (page {page}): {snippet}...")
-    return "\n\n".join(context_blocks)
+def format_context(docs, max_tokens=DEFAULT_CONTEXT_TOKENS):
+    return build_context(docs, max_tokens=max_tokens)
 
 
 def get_answers(relevant_chunks, user_query, client):
@@ -198,53 +321,7 @@ def get_answers(relevant_chunks, user_query, client):
 
     # print("context given to context", context)
 
-    SYSTEM_PROMPT = f"""
-    You are an expert AI assistant. Base all answers only on the provided Context.
-
-    Return a single JSON object (no extra text) using this schema:
-    {{
-    "stage": "one of: analyse, considerations, validation, result, output",
-    "content": "string (concise, user-facing; max 150 words)",
-    "sources": ["optional short references to the provided context, e.g. 'doc_3: paragraph 2'"],
-    "status": "final" or "continue"
-    }}
-
-    Behavior rules:
-    - "analyse": 1–2 sentence summary of what the user asked and the relevant context to check.
-    - "considerations": up to 3 short bullets (each 1 sentence) listing factors considered — user-facing, not private reasoning.
-    - "validation": one short sentence indicating if the chosen interpretation aligns with the context/sources.
-    - "result": proper answer summary.
-    - "output": the final user-facing answer, clear and actionable (this is what should be shown to the user).
-    - If more context or clarification is needed, set "status":"continue". Otherwise "status":"final".
-    - Always return strictly valid JSON (no surrounding explanation text).
-    - Do not answer on your own, only answer from the context.
-    - If you don’t find the answer in context, return:  {{ "status" : "final" , "content": "I dont know bruv" }}
-
-
-    Context: {context}
-    """
-
-    messages = [
-        {"role": "system", "content": SYSTEM_PROMPT},
-        {"role": "user", "content": user_query},
-    ]
-
-    for attempt in range(3):
-        resp = client.chat.completions.create(
-            model="gpt-4o-mini",
-            messages=messages,
-            temperature=0,
-        )
-        try:
-            # print("response", resp)
-            parsed = json.loads(resp.choices[0].message.content)
-        except json.JSONDecodeError:
-            print(f"⚠️ Invalid JSON at attempt {attempt+1}, retrying...")
-            continue
-
-        if parsed.get("status") == "final":
-            print(f"✅ Final answer: {parsed['content']}")
-            break
+    return answer_from_context(client, context, user_query)
 
 
 def main():
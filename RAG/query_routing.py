@@ -1,60 +1,77 @@
-import re
+from functools import lru_cache
+from dotenv import load_dotenv
+from langchain_openai import OpenAIEmbeddings
+from embedding_cache import CachedEmbeddings
+from router import CentroidRouter, RuleRouter
+
+# Checked in order, first match wins
+ROUTING_RULES = [
+    # (rule name, route, keywords/phrases, only at the start of the query)
+    ("comparison", "DECOMPOSE", ["compare", "vs", "difference"], False),
+    # whole words: the old startswith("define") also caught defined/defines
+    ("definition", "HYDE", ["what is", "define", "defined", "defines"], True),
+    ("process", "STEPBACK", ["how", "why", "steps", "process"], False),
+    ("broad", "FUSION", ["examples of", "ways to", "best", "overview"], False),
+]
+
+rule_router = RuleRouter(ROUTING_RULES, default="DIRECT")
 
 def logical_router(query: str) -> str:
     """Decide route with simple rules."""
-    query_lower = query.lower()
-
-    if re.search(r"\b(compare|vs|difference)\b", query_lower):
-        return "DECOMPOSE"
-    elif query_lower.startswith("what is") or query_lower.startswith("define"):
-        return "HYDE"
-    elif re.search(r"\b(how|why|steps|process)\b", query_lower):
-        return "STEPBACK"
-    else:
-        return "DIRECT"
+    return rule_router.route(query)
 
-# --- Tests
-print(logical_router("What is a queue?"))               # HYDE
-print(logical_router("iPhone vs Samsung which is better?"))  # DECOMPOSE
-print(logical_router("How does recursion work?"))       # STEPBACK
-print(logical_router("Explain the partition function in physics"))  # DIRECT
+def logical_router_batch(queries) -> list:
+    """Rule-route a batch (or stream) of queries."""
+    return rule_router.route_many(queries)
 
 
 #Semantic Routing
 
-from langchain_openai import OpenAIEmbeddings
-from langchain.vectorstores import FAISS
-
-# 1. Setup embeddings
-embeddings = OpenAIEmbeddings(model="text-embedding-3-small")
-
-# 2. Example route categories
+# 1. Example route categories
 ROUTES = {
     "HYDE": ["what is a stack?", "define polymorphism", "explain recursion"],
     "DECOMPOSE": ["compare python and java", "difference between queue and stack"],
     "STEPBACK": ["how does memory allocation work", "why use linked lists"],
+    "FUSION": ["examples of sorting algorithms", "best ways to traverse a tree"],
     "DIRECT": ["when was Python created", "history of AI"]
 }
 
-# 3. Build a FAISS index where each route has example queries
-docs = []
-metadatas = []
-for route, examples in ROUTES.items():
-    for ex in examples:
-        docs.append(ex)
-        metadatas.append({"route": route})
+# 2. Route centroids are embedded once, saved to disk and memory-mapped on
+# later runs; built lazily so importing this module costs nothing
+@lru_cache(maxsize=None)
+def get_router() -> CentroidRouter:
+    load_dotenv()
+    embeddings = CachedEmbeddings(OpenAIEmbeddings(model="text-embedding-3-small"))
+    # too close to call between two routes -> use the rules instead
+    return CentroidRouter(embeddings, ROUTES, fallback=logical_router)
 
-# Store them in FAISS vector DB
-db = FAISS.from_texts(docs, embedding=embeddings, metadatas=metadatas)
-
-# 4. Router function
+# 3. Router functions
 def semantic_router(query: str) -> str:
-    """Route query by nearest neighbor in semantic space."""
-    results = db.similarity_search(query, k=1)  # top 1 match
-    return results[0].metadata["route"]
-
-# --- Tests
-print(semantic_router("What is a queue?"))               # HYDE
-print(semantic_router("iPhone vs Samsung which is better?"))  # DECOMPOSE
-print(semantic_router("How does recursion work?"))       # STEPBACK
-print(semantic_router("Tell me the history of Python"))  # DIRECT
+    """Route query by the nearest route centroid in semantic space."""
+    return get_router().route(query)
+
+def semantic_router_batch(queries: list) -> list:
+    """Route many queries with a single embeddings call."""
+    return get_router().route_many(queries)
+
+
+if __name__ == "__main__":
+    # --- Tests
+    print(logical_router("What is a queue?"))               # HYDE
+    print(logical_router("iPhone vs Samsung which is better?"))  # DECOMPOSE
+    print(logical_router("How does recursion work?"))       # STEPBACK
+    print(logical_router("Explain the partition function in physics"))  # DIRECT
+    print(dict(rule_router.hits))
+
+    # --- Tests
+    print(semantic_router("What is a queue?"))               # HYDE
+    print(semantic_router("iPhone vs Samsung which is better?"))  # DECOMPOSE
+    print(semantic_router("How does recursion work?"))       # STEPBACK
+    print(semantic_router("Tell me the history of Python"))  # DIRECT
+
+    print(semantic_router_batch([
+        "What is a queue?",
+        "iPhone vs Samsung which is better?",
+        "How does recursion work?",
+        "Tell me the history of Python",
+    ]))
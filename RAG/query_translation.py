@@ -1,13 +1,15 @@
 from pathlib import Path
-from langchain_community.document_loaders import PyPDFLoader
-from langchain_text_splitters import RecursiveCharacterTextSplitter
 from langchain_openai import OpenAIEmbeddings
-from langchain_qdrant import QdrantVectorStore
 from openai import OpenAI
 from dotenv import load_dotenv
-import json
 import os
 from typing import List
+from ingestion import stream_pdf_into_qdrant
+from embedding_cache import CachedEmbeddings
+from llm_cache import cached_completion, init_llm_cache
+from retrievers import get_vector_store
+from context_builder import DEFAULT_CONTEXT_TOKENS, build_context
+from answering import answer_from_context
 
 
 def init_clients():
@@ -15,35 +17,24 @@ def init_clients():
     load_dotenv()
     openai_api_key = os.getenv("OPENAI_API_KEY")
     client = OpenAI()
-    embeddings = OpenAIEmbeddings(
-        model="text-embedding-3-large", api_key=openai_api_key
+    embeddings = CachedEmbeddings(
+        OpenAIEmbeddings(model="text-embedding-3-large", api_key=openai_api_key)
     )
+    init_llm_cache(embeddings)
     print("clients ready!")
     return client, embeddings
 
 
 def inject_pdf(pdf_path, embeddings):
     print("injecting pdf..")
-    loader = PyPDFLoader(file_path=pdf_path)
 
-    docs = loader.load()
-
-    text_splitter = RecursiveCharacterTextSplitter(
-        chunk_size=1000,
-        chunk_overlap=200,
-    )
-
-    split_docs = text_splitter.split_documents(documents=docs)
-
-    vector_store = QdrantVectorStore.from_documents(
-        documents=[],
-        url="http://localhost:6333",
+    stream_pdf_into_qdrant(
+        pdf_path,
+        embeddings,
         collection_name="parallel_query",
-        embedding=embeddings,
+        url="http://localhost:6333",
     )
 
-    vector_store.add_documents(documents=split_docs)
-
     print("PDF Injection Compelete!")
 
 
@@ -54,7 +45,8 @@ def rewrite_query(client, user_query) -> List[str]:
     Take the user query and rewrite it
     """
 
-    res = client.chat.completions.create(
+    rewrites = cached_completion(
+        client,
         model="gpt-4o-mini",
         messages=[
             {"role": "system", "content": SYSTEM_PROMPT},
@@ -62,8 +54,6 @@ def rewrite_query(client, user_query) -> List[str]:
         ],
     )
 
-    rewrites = res.choices[0].message.content
-
     print(f"Original User Query: {user_query}")
     print("Rewritten: ", rewrites)
 
@@ -72,11 +62,7 @@ def rewrite_query(client, user_query) -> List[str]:
 
 def retrieve_unique_docs(embeddings, query):
     print("Retrieving Relevant Unique Chunks..")
-    retriever = QdrantVectorStore.from_existing_collection(
-        url="http://localhost:6333",
-        collection_name="parallel_query",
-        embedding=embeddings,
-    )
+    retriever = get_vector_store(embeddings, collection_name="parallel_query")
 
     chunks = retriever.similarity_search(query=query)
     pages = {doc.metadata.get("page") for doc in chunks}
@@ -86,13 +72,8 @@ def retrieve_unique_docs(embeddings, query):
     return chunks
 
 
-def format_context(docs):
-    context_blocks = []
-    for i, doc in enumerate(docs, start=1):
-        page = doc.metadata.get("page", "unknown")
-        snippet = doc.page_content.strip().replace("\n", " ")
-        context_blocks.append(f"doc_{i} (page {page}): {snippet}...")
-    return "\n\n".join(context_blocks)
+def format_context(docs, max_tokens=DEFAULT_CONTEXT_TOKENS):
+    return build_context(docs, max_tokens=max_tokens)
 
 
 def get_answers(relevant_chunks, user_query, client):
@@ -101,53 +82,7 @@ def get_answers(relevant_chunks, user_query, client):
 
     print("context given to context", context)
 
-    SYSTEM_PROMPT = f"""
-    You are an expert AI assistant. Base all answers only on the provided Context.
-
-    Return a single JSON object (no extra text) using this schema:
-    {{
-    "stage": "one of: analyse, considerations, validation, result, output",
-    "content": "string (concise, user-facing; max 150 words)",
-    "sources": ["optional short references to the provided context, e.g. 'doc_3: paragraph 2'"],
-    "status": "final" or "continue"
-    }}
-
-    Behavior rules:
-    - "analyse": 1–2 sentence summary of what the user asked and the relevant context to check.
-    - "considerations": up to 3 short bullets (each 1 sentence) listing factors considered — user-facing, not private reasoning.
-    - "validation": one short sentence indicating if the chosen interpretation aligns with the context/sources.
-    - "result": proper answer summary.
-    - "output": the final user-facing answer, clear and actionable (this is what should be shown to the user).
-    - If more context or clarification is needed, set "status":"continue". Otherwise "status":"final".
-    - Always return strictly valid JSON (no surrounding explanation text).
-    - Do not answer on your own, only answer from the context.
-    - If you don’t find the answer in context, return:  {{ "status" : "final" , "content": "I dont know bruv" }}
-
-
-    Context: {context}
-    """
-
-    messages = [
-        {"role": "system", "content": SYSTEM_PROMPT},
-        {"role": "user", "content": user_query},
-    ]
-
-    for attempt in range(3):
-        resp = client.chat.completions.create(
-            model="gpt-4o-mini",
-            messages=messages,
-            temperature=0,
-        )
-        try:
-            # print("response", resp)
-            parsed = json.loads(resp.choices[0].message.content)
-        except json.JSONDecodeError:
-            print(f"⚠️ Invalid JSON at attempt {attempt+1}, retrying...")
-            continue
-
-        if parsed.get("status") == "final":
-            print(f"✅ Final answer: {parsed['content']}")
-            break
+    return answer_from_context(client, context, user_query)
 
 
 def main():
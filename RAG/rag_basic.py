@@ -1,53 +1,39 @@
 from pathlib import Path
-from langchain_community.document_loaders import PyPDFLoader
-from langchain_text_splitters import RecursiveCharacterTextSplitter
 from langchain_openai import OpenAIEmbeddings
-from langchain_qdrant import QdrantVectorStore
 from openai import OpenAI
 from dotenv import load_dotenv
 import json
 import os
+from embedding_cache import CachedEmbeddings
+from ingestion import stream_pdf_into_qdrant
+from retrievers import get_vector_store
+from sparse_index import BM25Index
+from hybrid import hybrid_search
 
 load_dotenv()
 
 pdf_path = Path(__file__).parent / "dissertation.pdf"
 
-loader = PyPDFLoader(file_path=pdf_path)
-
-docs = loader.load()
-
-text_splitter = RecursiveCharacterTextSplitter(
-    chunk_size=1000,
-    chunk_overlap=200,
-)
-
-split_docs = text_splitter.split_documents(documents=docs)
-
 openai_api_key = os.getenv("OPENAI_API_KEY")
 
-embeddings = OpenAIEmbeddings(model="text-embedding-3-large", api_key=openai_api_key)
-
-# vector_store = QdrantVectorStore.from_documents(
-#     documents=[],
-#     url="http://localhost:6333",
-#     collection_name="learning_langchain",
-#     embedding=embeddings,
-# )
+embeddings = CachedEmbeddings(
+    OpenAIEmbeddings(model="text-embedding-3-large", api_key=openai_api_key)
+)
 
-# vector_store.add_documents(documents=split_docs)
+# stream_pdf_into_qdrant(pdf_path, embeddings, collection_name="learning_langchain")
 
 # print("Injection Compelete!")
 
 
-retriever = QdrantVectorStore.from_existing_collection(
-    url="http://localhost:6333",
-    collection_name="learning_langchain",
-    embedding=embeddings,
-)
+retriever = get_vector_store(embeddings, collection_name="learning_langchain")
 
 user_query = "what is Cause or Effect Matrix?"
 
-relevant_chunks = retriever.similarity_search(query=user_query)
+# dense + BM25, so exact phrases like "Cause or Effect Matrix" aren't missed.
+# The BM25 side is built by the same stream_pdf_into_qdrant call above.
+sparse_index = BM25Index.load("learning_langchain")
+
+relevant_chunks = hybrid_search(retriever, sparse_index, [user_query])[0]
 
 # print("relevant chunks are",relevant_chunks)
 
@@ -1,13 +1,19 @@
 from pathlib import Path
-from langchain_community.document_loaders import PyPDFLoader
-from langchain_text_splitters import RecursiveCharacterTextSplitter
 from langchain_openai import OpenAIEmbeddings
-from langchain_qdrant import QdrantVectorStore
 from openai import OpenAI
 from dotenv import load_dotenv
 import json
+import numpy as np
 import os
 from typing import List
+from ingestion import stream_pdf_into_qdrant
+from embedding_cache import CachedEmbeddings
+from llm_cache import cached_completion, init_llm_cache
+from retrievers import get_vector_store, batch_similarity_search
+from fusion import fuse_ids, chunk_key
+from rerank import load_reranker
+from context_builder import DEFAULT_CONTEXT_TOKENS, build_context
+from answering import answer_from_context
 
 
 def init_clients():
@@ -15,45 +21,29 @@ def init_clients():
     load_dotenv()
     openai_api_key = os.getenv("OPENAI_API_KEY")
     client = OpenAI()
-    embeddings = OpenAIEmbeddings(
-        model="text-embedding-3-large", api_key=openai_api_key
+    embeddings = CachedEmbeddings(
+        OpenAIEmbeddings(model="text-embedding-3-large", api_key=openai_api_key)
     )
+    init_llm_cache(embeddings)
     print("clients ready!")
     return client, embeddings
 
 
 def inject_pdf(pdf_path, embeddings):
     print("injecting pdf..")
-    loader = PyPDFLoader(file_path=pdf_path)
 
-    docs = loader.load()
-
-    text_splitter = RecursiveCharacterTextSplitter(
-        chunk_size=1000,
-        chunk_overlap=200,
-    )
-
-    split_docs = text_splitter.split_documents(documents=docs)
-
-    vector_store = QdrantVectorStore.from_documents(
-        documents=[],
-        url="http://localhost:6333",
+    stream_pdf_into_qdrant(
+        pdf_path,
+        embeddings,
         collection_name="parallel_query",
-        embedding=embeddings,
+        url="http://localhost:6333",
     )
 
-    vector_store.add_documents(documents=split_docs)
-
     print("PDF Injection Compelete!")
 
 
-def format_context(docs):
-    context_blocks = []
-    for i, doc in enumerate(docs, start=1):
-        page = doc.metadata.get("page", "unknown")
-        snippet = doc.page_content.strip().replace("\n", " ")
-        context_blocks.append(f"doc_{i} (page {page}): {snippet}...")
-    return "\n\n".join(context_blocks)
+def format_context(docs, max_tokens=DEFAULT_CONTEXT_TOKENS):
+    return build_context(docs, max_tokens=max_tokens)
 
 
 def get_answers(relevant_chunks, user_query, client):
@@ -62,53 +52,7 @@ def get_answers(relevant_chunks, user_query, client):
 
     # print("context given to context", context)
 
-    SYSTEM_PROMPT = f"""
-    You are an expert AI assistant. Base all answers only on the provided Context.
-
-    Return a single JSON object (no extra text) using this schema:
-    {{
-    "stage": "one of: analyse, considerations, validation, result, output",
-    "content": "string (concise, user-facing; max 150 words)",
-    "sources": ["optional short references to the provided context, e.g. 'doc_3: paragraph 2'"],
-    "status": "final" or "continue"
-    }}
-
-    Behavior rules:
-    - "analyse": 1–2 sentence summary of what the user asked and the relevant context to check.
-    - "considerations": up to 3 short bullets (each 1 sentence) listing factors considered — user-facing, not private reasoning.
-    - "validation": one short sentence indicating if the chosen interpretation aligns with the context/sources.
-    - "result": proper answer summary.
-    - "output": the final user-facing answer, clear and actionable (this is what should be shown to the user).
-    - If more context or clarification is needed, set "status":"continue". Otherwise "status":"final".
-    - Always return strictly valid JSON (no surrounding explanation text).
-    - Do not answer on your own, only answer from the context.
-    - If you don’t find the answer in context, return:  {{ "status" : "final" , "content": "I dont know bruv" }}
-
-
-    Context: {context}
-    """
-
-    messages = [
-        {"role": "system", "content": SYSTEM_PROMPT},
-        {"role": "user", "content": user_query},
-    ]
-
-    for attempt in range(3):
-        resp = client.chat.completions.create(
-            model="gpt-4o-mini",
-            messages=messages,
-            temperature=0,
-        )
-        try:
-            # print("response", resp)
-            parsed = json.loads(resp.choices[0].message.content)
-        except json.JSONDecodeError:
-            print(f"⚠️ Invalid JSON at attempt {attempt+1}, retrying...")
-            continue
-
-        if parsed.get("status") == "final":
-            print(f"✅ Final answer: {parsed['content']}")
-            break
+    return answer_from_context(client, context, user_query)
 
 
 def rewrite_query(client, user_query) -> List[str]:
@@ -119,7 +63,8 @@ def rewrite_query(client, user_query) -> List[str]:
     Return the output strictly as a JSON list of strings, nothing else.
     """
 
-    res = client.chat.completions.create(
+    raw_output = cached_completion(
+        client,
         model="gpt-4o-mini",
         messages=[
             {"role": "system", "content": SYSTEM_PROMPT},
@@ -146,7 +91,6 @@ def rewrite_query(client, user_query) -> List[str]:
         },
     )
 
-    raw_output = res.choices[0].message.content
     rewrites = json.loads(raw_output)
 
     user_query_list = rewrites.get("questions")
@@ -158,25 +102,25 @@ def rewrite_query(client, user_query) -> List[str]:
     return user_query_list
 
 
-def retrieve_ranked_docs(embeddings, query_list):
+def retrieve_ranked_docs(embeddings, query_list, k=20):
     print("Retrieving Relevant Chunks per Query..")
-    retriever = QdrantVectorStore.from_existing_collection(
-        url="http://localhost:6333",
-        collection_name="parallel_query",
-        embedding=embeddings,
-    )
+    retriever = get_vector_store(embeddings, collection_name="parallel_query")
+
+    rankings = []  # one int array of doc ids per query
+    doc_ids = {}  # chunk key -> dense int id, assigned as chunks come back
+    docs = []  # int id -> document
 
-    rankings = []  # list of ranked doc_ids per query
-    doc_map = {}  # map doc_id -> document
+    results = batch_similarity_search(retriever, query_list, k=k)
 
-    for i, query in enumerate(query_list):
-        chunks = retriever.similarity_search(query=query, k=20)
+    for i, (query, chunks) in enumerate(zip(query_list, results)):
 
-        ranking = []
+        ranking = np.empty(len(chunks), dtype=np.int64)
         for rank, doc in enumerate(chunks):
-            doc_id = f"{doc.metadata.get('page')}::{rank}"  # unique ID per doc
-            ranking.append(doc_id)
-            doc_map[doc_id] = doc
+            key = chunk_key(doc)  # same chunk -> same id across queries
+            if key not in doc_ids:
+                doc_ids[key] = len(docs)
+                docs.append(doc)
+            ranking[rank] = doc_ids[key]
 
         rankings.append(ranking)
         print("rankinG=> ", ranking)
@@ -184,46 +128,58 @@ def retrieve_ranked_docs(embeddings, query_list):
         for doc in chunks:
             print({"page": doc.metadata.get("page")})
 
-    return rankings, doc_map
+    return rankings, docs
 
 
-def rank_fusion(rankings, k=60):
-    scores = {}
-    for ranking in rankings:
-        for rank, doc_id in enumerate(ranking):
-            scores[doc_id] = scores.get(doc_id, 0) + 1 / (k + rank + 1)
+def rank_fusion(rankings, n_ids, k=60, top_n=None, method="rrf", weights=None):
+    # ids are already dense ints, so fusion is pure numpy
+    ids, scores = fuse_ids(
+        rankings, n_ids, method=method, k=k, weights=weights, top_n=top_n
+    )
+    return list(zip(ids.tolist(), scores.tolist()))
 
-    return sorted(scores.items(), key=lambda x: x[1], reverse=True)
 
+def run_rank_fusion(client, embeddings, user_query, top_n=3):
+    query_list = rewrite_query(client, user_query)
 
-def main():
-    client, embeddings = init_clients()
+    reranker = load_reranker()  # None without torch/transformers
 
-    pdf_path = Path(__file__).parent / "rag_practice.pdf"
+    # Step 1: get ranked results for each query (wide when we can rerank)
+    rankings, docs = retrieve_ranked_docs(
+        embeddings, query_list, k=50 if reranker else 20
+    )
 
-    # inject_pdf(pdf_path, embeddings)
+    print("rankings=> ", rankings)
 
-    user_query = "What is a queue?"
+    # Step 2: fuse the rankings
+    fused = rank_fusion(rankings, len(docs), k=60, top_n=20 if reranker else top_n)
 
-    trick_question = "how good are movies?"
+    print("fused=> ", fused)
 
-    query_list = rewrite_query(client, user_query)
+    # Step 3: pick top N fused docs, reranked against the original query
+    top_docs = [docs[doc_id] for doc_id, _ in fused]
+    if reranker:
+        reranked = reranker.rerank(user_query, top_docs, top_n=top_n)
+        print("reranked=> ", [(chunk_key(doc), score) for doc, score in reranked])
+        top_docs = [doc for doc, _ in reranked]
+    top_docs = top_docs[:top_n]
 
-    # Step 1: get ranked results for each query
-    rankings, doc_map = retrieve_ranked_docs(embeddings, query_list)
+    # Now you can pass fused docs to your answer generator
+    return get_answers(top_docs, user_query, client)
 
-    print("rankings=> ", rankings)
 
-    # Step 2: fuse the rankings
-    fused = rank_fusion(rankings, k=60)
+def main():
+    client, embeddings = init_clients()
 
-    print("fused=> ", fused)
+    pdf_path = Path(__file__).parent / "rag_practice.pdf"
 
-    # Step 3: pick top N fused docs
-    top_docs = [doc_map[doc_id] for doc_id, _ in fused[:3]]
+    # inject_pdf(pdf_path, embeddings)
 
-    # Now you can pass fused docs to your answer generator
-    get_answers(top_docs, user_query, client)
+    user_query = "What is a queue?"
+
+    trick_question = "how good are movies?"
+
+    run_rank_fusion(client, embeddings, user_query)
 
 
 if __name__ == "__main__":
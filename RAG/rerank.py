@@ -0,0 +1,121 @@
+import hashlib
+import threading
+from collections import OrderedDict
+import numpy as np
+from fusion import chunk_key
+
+try:
+    import torch
+    from transformers import AutoModelForSequenceClassification, AutoTokenizer
+except ImportError:  # optional, reranking is skipped without it
+    torch = None
+
+DEFAULT_MODEL = "cross-encoder/ms-marco-MiniLM-L-6-v2"
+
+
+class CrossEncoderReranker:
+    """
+    Scores (query, chunk) pairs with a small cross-encoder on CPU.
+
+    Pairs are sorted by token length and batched, so each batch is padded
+    only to its own longest pair instead of the global max. Scores are
+    cached per (query, chunk id), so re-ranking overlapping candidate sets
+    only runs the new pairs.
+    """
+
+    def __init__(
+        self,
+        model_name=DEFAULT_MODEL,
+        batch_size=32,
+        max_length=512,
+        cache_size=10_000,
+        device="cpu",
+    ):
+        if torch is None:
+            raise ImportError(
+                "Reranking needs torch and transformers: pip install torch transformers"
+            )
+        self.tokenizer = AutoTokenizer.from_pretrained(model_name)
+        self.model = AutoModelForSequenceClassification.from_pretrained(model_name)
+        self.model.to(device).eval()
+        self.device = device
+        self.batch_size = batch_size
+        self.max_length = max_length
+
+        self.cache = OrderedDict()
+        self.cache_size = cache_size
+        self.lock = threading.Lock()
+
+    def _predict(self, query, texts):
+        # token lengths decide the buckets; the longest pairs go together
+        lengths = [
+            len(ids)
+            for ids in self.tokenizer(
+                [query] * len(texts),
+                texts,
+                truncation=True,
+                max_length=self.max_length,
+            )["input_ids"]
+        ]
+        order = np.argsort(lengths)
+        scores = np.empty(len(texts), dtype=np.float32)
+
+        with torch.inference_mode():
+            for start in range(0, len(texts), self.batch_size):
+                idx = order[start : start + self.batch_size]
+                features = self.tokenizer(
+                    [query] * len(idx),
+                    [texts[i] for i in idx],
+                    padding=True,
+                    truncation=True,
+                    max_length=self.max_length,
+                    return_tensors="pt",
+                ).to(self.device)
+                logits = self.model(**features).logits
+                scores[idx] = logits[:, 0].float().cpu().numpy()
+        return scores
+
+    def score(self, query, docs):
+        query_hash = hashlib.sha1(query.encode("utf-8")).hexdigest()
+        keys = [(query_hash, chunk_key(doc)) for doc in docs]
+        scores = np.empty(len(docs), dtype=np.float32)
+
+        missing = []
+        with self.lock:
+            for i, key in enumerate(keys):
+                if key in self.cache:
+                    self.cache.move_to_end(key)
+                    scores[i] = self.cache[key]
+                else:
+                    missing.append(i)
+
+        if missing:
+            fresh = self._predict(query, [docs[i].page_content for i in missing])
+            with self.lock:
+                for i, value in zip(missing, fresh):
+                    scores[i] = value
+                    self.cache[keys[i]] = float(value)
+                while len(self.cache) > self.cache_size:
+                    self.cache.popitem(last=False)
+        return scores
+
+    def rerank(self, query, docs, top_n=3):
+        """Best `top_n` of docs as [(doc, score)], highest score first."""
+        if not docs:
+            return []
+        scores = self.score(query, docs)
+        order = np.argsort(-scores)[:top_n]
+        return [(docs[i], float(scores[i])) for i in order]
+
+
+_reranker = None
+
+
+def load_reranker(**kwargs):
+    """Shared reranker, or None when torch/transformers aren't installed."""
+    global _reranker
+    if torch is None:
+        return None
+    if _reranker is None:
+        _reranker = CrossEncoderReranker(**kwargs)
+    return _reranker
@@ -0,0 +1,143 @@
+import os
+import threading
+from langchain_qdrant import QdrantVectorStore
+from langchain_core.documents import Document
+from qdrant_client import QdrantClient
+from qdrant_client.http import models
+from local_index import DEFAULT_INDEX_DIR, LocalVectorIndex
+
+QDRANT_URL = "http://localhost:6333"
+
+# process-wide registry: one client per server, one store per collection
+_clients = {}
+_stores = {}
+_lock = threading.Lock()
+
+
+def get_qdrant_client(url=QDRANT_URL, prefer_grpc=True):
+    """Return the shared client for `url`, creating it on first use."""
+    key = (url, prefer_grpc)
+    with _lock:
+        if key not in _clients:
+            _clients[key] = QdrantClient(url=url, prefer_grpc=prefer_grpc)
+        return _clients[key]
+
+
+def get_vector_store(
+    embeddings,
+    collection_name="parallel_query",
+    url=QDRANT_URL,
+    prefer_grpc=True,
+    backend=None,
+):
+    """
+    Return a warm vector store for the collection. The collection is
+    validated once, later calls reuse the same handle and connection.
+
+    `backend` is "qdrant" (default) or "local" for the in-process
+    LocalVectorIndex (filled by ingestion.stream_pdf_into_local_index or
+    copied with LocalVectorIndex.from_qdrant); the RAG_VECTOR_BACKEND env
+    var sets the default.
+    """
+    backend = backend or os.getenv("RAG_VECTOR_BACKEND", "qdrant")
+    key = (backend, url, prefer_grpc, collection_name, id(embeddings))
+    with _lock:
+        entry = _stores.get(key)
+        if entry is not None and entry[0] is embeddings:
+            return entry[1]
+
+    if backend == "local":
+        # opened with the dtype it was built with
+        store = LocalVectorIndex.open(embeddings, DEFAULT_INDEX_DIR / collection_name)
+    elif backend == "qdrant":
+        store = QdrantVectorStore(
+            client=get_qdrant_client(url, prefer_grpc),
+            collection_name=collection_name,
+            embedding=embeddings,
+        )
+    else:
+        raise ValueError(f"Unknown vector backend {backend!r}")
+
+    with _lock:
+        # keep a reference to embeddings so its id can't be recycled
+        _stores[key] = (embeddings, store)
+    return store
+
+
+def point_to_document(
+    point, collection_name, content_key="page_content", metadata_key="metadata"
+):
+    payload = point.payload or {}
+    metadata = dict(payload.get(metadata_key) or {})
+    metadata["_id"] = point.id
+    metadata["_collection_name"] = collection_name
+    return Document(page_content=payload.get(content_key, ""), metadata=metadata)
+
+
+def rescore_params(oversampling=2.0):
+    """
+    Search params for quantised collections: candidates are found with the
+    quantised vectors, `oversampling` x k of them are rescored with the
+    full-precision originals.
+    """
+    return models.SearchParams(
+        quantization=models.QuantizationSearchParams(
+            rescore=True, oversampling=oversampling
+        )
+    )
+
+
+def batch_similarity_search(
+    vector_store, queries, k=4, with_scores=False, search_params=None
+):
+    """
+    Run one similarity search per query in a single round trip: every query
+    is embedded in one embeddings call and the searches go to Qdrant as one
+    batch request. Returns one result list per query, in order.
+    """
+    queries = list(queries)
+    if not queries:
+        return []
+
+    if isinstance(vector_store, LocalVectorIndex):
+        return vector_store.batch_search(queries, k=k, with_scores=with_scores)
+
+    vectors = vector_store.embeddings.embed_documents(queries)
+    requests = [
+        models.QueryRequest(
+            query=vector,
+            limit=k,
+            using=vector_store.vector_name or None,
+            params=search_params,
+            with_payload=True,
+        )
+        for vector in vectors
+    ]
+    responses = vector_store.client.query_batch_points(
+        collection_name=vector_store.collection_name, requests=requests
+    )
+
+    results = []
+    for response in responses:
+        hits = [
+            (
+                point_to_document(
+                    p,
+                    vector_store.collection_name,
+                    vector_store.content_payload_key,
+                    vector_store.metadata_payload_key,
+                ),
+                p.score,
+            )
+            for p in response.points
+        ]
+        results.append(hits if with_scores else [doc for doc, _ in hits])
+    return results
+
+
+def close_all():
+    with _lock:
+        for client in _clients.values():
+            client.close()
+        _clients.clear()
+        _stores.clear()
@@ -0,0 +1,173 @@
+import hashlib
+import json
+import re
+from collections import Counter
+from pathlib import Path
+import numpy as np
+
+DEFAULT_ROUTER_DIR = Path(__file__).parent / ".router"
+
+
+def embedding_model_name(embeddings):
+    """Model identity of an Embeddings object, looking through CachedEmbeddings."""
+    if hasattr(embeddings, "namespace"):
+        return embeddings.namespace
+    model = getattr(embeddings, "model", type(embeddings).__name__)
+    return f"{model}:{getattr(embeddings, 'dimensions', None) or 'native'}"
+
+
+def normalize(matrix):
+    matrix = np.asarray(matrix, dtype=np.float32)
+    norms = np.linalg.norm(matrix, axis=-1, keepdims=True)
+    return matrix / np.where(norms == 0, 1, norms)
+
+
+class CentroidRouter:
+    """
+    Semantic router over precomputed route centroids.
+
+    Every example of a route is embedded once, L2-normalised and averaged
+    into a centroid. Examples and centroids are stored as .npy under a key
+    derived from the routes and the embedding model, so a changed route
+    set or model rebuilds them and an unchanged one is just memory-mapped.
+
+    A query goes to the route with the highest cosine similarity. If the
+    best route doesn't beat the runner-up by `margin`, the query is handed
+    to `fallback` (e.g. a rule-based router) instead.
+    """
+
+    def __init__(
+        self,
+        embeddings,
+        routes,
+        directory=DEFAULT_ROUTER_DIR,
+        margin=0.03,
+        fallback=None,
+    ):
+        self.embeddings = embeddings
+        self.routes = {name: list(examples) for name, examples in routes.items()}
+        self.names = list(self.routes)
+        self.margin = margin
+        self.fallback = fallback
+
+        key = json.dumps(
+            {"routes": self.routes, "model": embedding_model_name(embeddings)},
+            sort_keys=True,
+        )
+        self.path = Path(directory) / hashlib.sha1(key.encode()).hexdigest()[:16]
+        if not (self.path / "centroids.npy").exists():
+            self._build()
+
+        self.centroids = np.load(self.path / "centroids.npy", mmap_mode="r")
+        self.examples = np.load(self.path / "examples.npy", mmap_mode="r")
+
+    def _build(self):
+        texts = [example for examples in self.routes.values() for example in examples]
+        vectors = normalize(self.embeddings.embed_documents(texts))
+
+        centroids = []
+        start = 0
+        for name in self.names:
+            stop = start + len(self.routes[name])
+            centroids.append(vectors[start:stop].mean(axis=0))
+            start = stop
+
+        self.path.mkdir(parents=True, exist_ok=True)
+        np.save(self.path / "examples.npy", vectors)
+        np.save(self.path / "centroids.npy", normalize(np.stack(centroids)))
+        (self.path / "routes.json").write_text(json.dumps(self.routes, indent=2))
+
+    def scores(self, vectors):
+        """Cosine similarity of each query vector to each route centroid."""
+        return normalize(vectors) @ np.asarray(self.centroids).T
+
+    def classify(self, queries):
+        """[(route, confidence margin)] for many queries, one embeddings call."""
+        queries = list(queries)
+        if not queries:
+            return []
+        scores = self.scores(self.embeddings.embed_documents(queries))
+
+        if len(self.names) > 1:
+            top2 = np.partition(scores, -2, axis=1)[:, -2:]
+            margins = top2[:, 1] - top2[:, 0]
+        else:
+            margins = np.full(len(queries), np.inf)
+        best = scores.argmax(axis=1)
+
+        results = []
+        for query, i, margin in zip(queries, best, margins):
+            if margin < self.margin and self.fallback is not None:
+                results.append((self.fallback(query), float(margin)))
+            else:
+                results.append((self.names[i], float(margin)))
+        return results
+
+    def route_many(self, queries):
+        return [route for route, _ in self.classify(queries)]
+
+    def route(self, query):
+        return self.route_many([query])[0]
+
+
+WORD_RE = re.compile(r"\w+")
+
+
+class RuleRouter:
+    """
+    Rule-based router compiled into a keyword automaton.
+
+    `rules` is an ordered table of (name, route, phrases, at_start): the
+    first rule in the table with a phrase in the query wins, like an if/elif
+    chain. `at_start` rules only match at the beginning of the query. All
+    phrases are compiled into one word-level trie, so a query is tokenised
+    once and each position walks the trie; the cost depends on the query
+    length, not on the number of rules. Matching is case-insensitive and on
+    whole words.
+    """
+
+    def __init__(self, rules, default):
+        self.rules = list(rules)
+        self.default = default
+        self.anywhere = {}  # trie: word -> child, None -> lowest rule index
+        self.at_start = {}
+        for i, (_, _, phrases, at_start) in enumerate(self.rules):
+            for phrase in phrases:
+                node = self.at_start if at_start else self.anywhere
+                for word in WORD_RE.findall(phrase.lower()):
+                    node = node.setdefault(word, {})
+                node[None] = min(node.get(None, i), i)
+        self.hits = Counter()  # rule name -> queries it routed
+
+    @staticmethod
+    def _walk(trie, words, start, best):
+        node = trie
+        for word in words[start:]:
+            node = node.get(word)
+            if node is None:
+                break
+            best = min(best, node.get(None, best))
+        return best
+
+    def match(self, query):
+        """(rule name, route) of the winning rule, or (None, default)."""
+        words = WORD_RE.findall(query.lower())
+        best = self._walk(self.at_start, words, 0, len(self.rules))
+        for start in range(len(words)):
+            if best == 0:
+                break
+            best = self._walk(self.anywhere, words, start, best)
+
+        if best == len(self.rules):
+            self.hits[None] += 1
+            return None, self.default
+        name, route, _, _ = self.rules[best]
+        self.hits[name] += 1
+        return name, route
+
+    def route(self, query):
+        return self.match(query)[1]
+
+    def route_many(self, queries):
+        """Routes for an iterable (or stream) of queries."""
+        return [self.match(query)[1] for query in queries]
@@ -0,0 +1,174 @@
+import json
+import re
+from collections import Counter
+from pathlib import Path
+import numpy as np
+
+DEFAULT_SPARSE_DIR = Path(__file__).parent / ".sparse_index"
+TOKEN_RE = re.compile(r"\w+")
+
+
+def tokenize(text):
+    return TOKEN_RE.findall(text.lower())
+
+
+class BM25Index:
+    """
+    BM25 keyword index kept next to the dense vectors.
+
+    Postings are stored CSR-style, sorted by term: `indptr[t]:indptr[t+1]`
+    slices `docs` (int32 row) and `tfs` (uint16 term frequency), so a query
+    only touches the postings of its own terms. New documents are buffered
+    and merged on `commit()`; re-adding an id replaces the old document.
+    """
+
+    def __init__(self, path=None, k1=1.5, b=0.75):
+        self.path = Path(path) if path else None
+        self.k1 = k1
+        self.b = b
+
+        self.vocab = {}  # term -> term id
+        self.ids = []  # row -> chunk id
+        self.rows = {}  # chunk id -> row
+        self.doc_len = np.zeros(0, dtype=np.int32)
+        self.alive = np.zeros(0, dtype=bool)
+        self.indptr = np.zeros(1, dtype=np.int64)
+        self.docs = np.zeros(0, dtype=np.int32)
+        self.tfs = np.zeros(0, dtype=np.uint16)
+
+        self.pending = []  # (row, Counter of term ids)
+        self.replaced = set()  # rows whose committed postings are stale
+
+    @classmethod
+    def load(cls, collection_name, directory=DEFAULT_SPARSE_DIR, **kwargs):
+        index = cls(path=Path(directory) / collection_name, **kwargs)
+        arrays_path = index.path / "postings.npz"
+        if not arrays_path.exists():
+            return index
+
+        arrays = np.load(arrays_path)
+        index.indptr = arrays["indptr"]
+        index.docs = arrays["docs"]
+        index.tfs = arrays["tfs"]
+        index.doc_len = arrays["doc_len"]
+        index.alive = arrays["alive"]
+
+        meta = json.loads((index.path / "meta.json").read_text(encoding="utf-8"))
+        index.vocab = {term: i for i, term in enumerate(meta["vocab"])}
+        index.ids = meta["ids"]
+        index.rows = {chunk_id: row for row, chunk_id in enumerate(index.ids)}
+        return index
+
+    def save(self):
+        self.commit()
+        self.path.mkdir(parents=True, exist_ok=True)
+        np.savez(
+            self.path / "postings.npz",
+            indptr=self.indptr,
+            docs=self.docs,
+            tfs=self.tfs,
+            doc_len=self.doc_len,
+            alive=self.alive,
+        )
+        (self.path / "meta.json").write_text(
+            json.dumps({"vocab": list(self.vocab), "ids": self.ids}), encoding="utf-8"
+        )
+
+    def __len__(self):
+        return int(self.alive.sum()) + sum(
+            1 for row, _ in self.pending if row >= len(self.alive)
+        )
+
+    def _row(self, chunk_id):
+        if chunk_id in self.rows:
+            row = self.rows[chunk_id]
+            self.replaced.add(row)
+            return row
+        row = len(self.ids)
+        self.ids.append(chunk_id)
+        self.rows[chunk_id] = row
+        return row
+
+    def add(self, ids, texts):
+        for chunk_id, text in zip(ids, texts):
+            counts = Counter(
+                self.vocab.setdefault(token, len(self.vocab))
+                for token in tokenize(text)
+            )
+            self.pending.append((self._row(chunk_id), counts))
+
+    def delete(self, ids):
+        ids = set(ids)
+        for chunk_id in ids:
+            row = self.rows.get(chunk_id)
+            if row is not None and row < len(self.alive):
+                self.alive[row] = False
+                self.doc_len[row] = 0
+                self.replaced.add(row)
+        self.pending = [(row, c) for row, c in self.pending if self.ids[row] not in ids]
+
+    def commit(self):
+        """Merge buffered documents into the CSR postings."""
+        if not self.pending and not self.replaced:
+            return
+
+        n_rows = len(self.ids)
+        doc_len = np.zeros(n_rows, dtype=np.int32)
+        doc_len[: len(self.doc_len)] = self.doc_len
+        alive = np.zeros(n_rows, dtype=bool)
+        alive[: len(self.alive)] = self.alive
+
+        # committed postings as COO, minus rows that were replaced or deleted
+        terms = np.repeat(np.arange(len(self.indptr) - 1), np.diff(self.indptr))
+        keep = ~np.isin(self.docs, np.fromiter(self.replaced, dtype=np.int32))
+        terms, docs, tfs = terms[keep], self.docs[keep], self.tfs[keep]
+
+        # an id added twice before a commit keeps only its latest text
+        latest = dict(self.pending)
+
+        new_terms, new_docs, new_tfs = [], [], []
+        for row, counts in latest.items():
+            new_terms.extend(counts.keys())
+            new_docs.extend([row] * len(counts))
+            new_tfs.extend(min(tf, 65535) for tf in counts.values())
+            doc_len[row] = sum(counts.values())
+            alive[row] = True
+
+        terms = np.concatenate([terms, np.asarray(new_terms, dtype=np.int64)])
+        docs = np.concatenate([docs, np.asarray(new_docs, dtype=np.int32)])
+        tfs = np.concatenate([tfs, np.asarray(new_tfs, dtype=np.uint16)])
+
+        order = np.lexsort((docs, terms))
+        self.docs, self.tfs = docs[order], tfs[order]
+        counts = np.bincount(terms, minlength=len(self.vocab))
+        self.indptr = np.concatenate(([0], np.cumsum(counts))).astype(np.int64)
+        self.doc_len, self.alive = doc_len, alive
+        self.pending, self.replaced = [], set()
+
+    def search(self, query, k=10):
+        """Top-k [(chunk id, bm25 score)] for one query."""
+        self.commit()
+        n_docs = int(self.alive.sum())
+        term_ids = {self.vocab[t] for t in tokenize(query) if t in self.vocab}
+        if not n_docs or not term_ids:
+            return []
+
+        avg_len = self.doc_len[self.alive].mean()
+        scores = np.zeros(len(self.ids))
+        for term in term_ids:
+            start, stop = self.indptr[term], self.indptr[term + 1]
+            docs = self.docs[start:stop]
+            tfs = self.tfs[start:stop].astype(np.float64)
+            df = stop - start
+            idf = np.log(1 + (n_docs - df + 0.5) / (df + 0.5))
+            norm = self.k1 * (1 - self.b + self.b * self.doc_len[docs] / avg_len)
+            scores[docs] += idf * tfs * (self.k1 + 1) / (tfs + norm)
+
+        hits = np.flatnonzero(scores)
+        if len(hits) > k:
+            hits = hits[np.argpartition(-scores[hits], k - 1)[:k]]
+        hits = hits[np.argsort(-scores[hits])]
+        return [(self.ids[row], float(scores[row])) for row in hits]
+
+    def search_many(self, queries, k=10):
+        return [self.search(query, k) for query in queries]
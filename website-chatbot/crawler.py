@@ -0,0 +1,143 @@
+import asyncio
+import hashlib
+import json
+import xml.etree.ElementTree as ET
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Dict, List
+import aiohttp
+from bs4 import BeautifulSoup
+from langchain_core.documents import Document
+
+MANIFEST_DIR = Path(__file__).parent / ".crawl_manifest"
+SITEMAP_NS = "{http://www.sitemaps.org/schemas/sitemap/0.9}"
+
+
+@dataclass
+class CrawlResult:
+    changed: List[Document] = field(default_factory=list)  # new or modified pages
+    changed_entries: Dict[str, dict] = field(default_factory=dict)  # committed after ingest
+    unchanged: Dict[str, dict] = field(default_factory=dict)  # url -> manifest entry
+    removed: List[str] = field(default_factory=list)  # urls gone from the sitemap
+
+
+def load_manifest(collection_name: str) -> Dict[str, dict]:
+    path = MANIFEST_DIR / f"{collection_name}.json"
+    if not path.exists():
+        return {}
+    return json.loads(path.read_text())
+
+
+def save_manifest(collection_name: str, manifest: Dict[str, dict]):
+    MANIFEST_DIR.mkdir(parents=True, exist_ok=True)
+    path = MANIFEST_DIR / f"{collection_name}.json"
+    tmp = path.with_suffix(".tmp")
+    tmp.write_text(json.dumps(manifest, indent=2, sort_keys=True))
+    tmp.replace(path)
+
+
+async def read_sitemap(session, sitemap_url: str) -> Dict[str, str]:
+    """Return {loc: lastmod} for every page, following sitemap indexes."""
+    async with session.get(sitemap_url) as resp:
+        resp.raise_for_status()
+        root = ET.fromstring(await resp.read())
+
+    if root.tag == f"{SITEMAP_NS}sitemapindex":
+        children = [
+            loc.text.strip() for loc in root.iter(f"{SITEMAP_NS}loc") if loc.text
+        ]
+        pages = {}
+        for part in await asyncio.gather(*(read_sitemap(session, c) for c in children)):
+            pages.update(part)
+        return pages
+
+    pages = {}
+    for url in root.iter(f"{SITEMAP_NS}url"):
+        loc = url.findtext(f"{SITEMAP_NS}loc")
+        if loc:
+            pages[loc.strip()] = (url.findtext(f"{SITEMAP_NS}lastmod") or "").strip()
+    return pages
+
+
+async def fetch_page(session, semaphore, url: str, lastmod: str, previous: dict):
+    """Conditional GET. Returns (manifest entry, Document or None if unchanged)."""
+    headers = {}
+    if previous.get("etag"):
+        headers["If-None-Match"] = previous["etag"]
+    if previous.get("last_modified"):
+        headers["If-Modified-Since"] = previous["last_modified"]
+
+    async with semaphore:
+        async with session.get(url, headers=headers) as resp:
+            if resp.status == 304:
+                return {**previous, "lastmod": lastmod}, None
+            resp.raise_for_status()
+            html = await resp.text()
+            etag = resp.headers.get("ETag")
+            last_modified = resp.headers.get("Last-Modified")
+
+    text = BeautifulSoup(html, "html.parser").get_text()
+    digest = hashlib.sha256(text.encode("utf-8")).hexdigest()
+    entry = {
+        "lastmod": lastmod,
+        "etag": etag,
+        "last_modified": last_modified,
+        "hash": digest,
+    }
+
+    # the server said it changed but the text is the same: nothing to re-embed
+    if digest == previous.get("hash"):
+        return entry, None
+
+    doc = Document(
+        page_content=text,
+        metadata={"source": url, "loc": url, "lastmod": lastmod},
+    )
+    return entry, doc
+
+
+async def crawl(
+    sitemap_url: str, manifest: Dict[str, dict], concurrency=8, timeout=30
+) -> CrawlResult:
+    """
+    Incremental crawl against a manifest of url -> {lastmod, etag,
+    last_modified, hash}. Pages whose sitemap <lastmod> is unchanged are not
+    fetched at all, the rest are fetched with conditional requests by a
+    bounded pool of `concurrency` connections.
+    """
+    result = CrawlResult()
+    semaphore = asyncio.Semaphore(concurrency)
+    client_timeout = aiohttp.ClientTimeout(total=timeout)
+
+    async with aiohttp.ClientSession(timeout=client_timeout) as session:
+        pages = await read_sitemap(session, sitemap_url)
+        result.removed = [url for url in manifest if url not in pages]
+
+        to_fetch = []
+        for url, lastmod in pages.items():
+            previous = manifest.get(url, {})
+            if lastmod and previous.get("hash") and previous.get("lastmod") == lastmod:
+                result.unchanged[url] = previous
+            else:
+                to_fetch.append((url, lastmod, previous))
+
+        fetched = await asyncio.gather(
+            *(fetch_page(session, semaphore, *args) for args in to_fetch),
+            return_exceptions=True,
+        )
+
+    for (url, _, previous), outcome in zip(to_fetch, fetched):
+        if isinstance(outcome, Exception):
+            print(f"⚠️ Failed to fetch {url}: {outcome}")
+            if previous:
+                result.unchanged[url] = previous  # keep what we had, retry next run
+            continue
+
+        entry, doc = outcome
+        if doc is None:
+            result.unchanged[url] = entry
+        else:
+            result.changed.append(doc)
+            result.changed_entries[url] = entry
+
+    return result
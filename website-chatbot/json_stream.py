@@ -0,0 +1,100 @@
+class JsonFieldStream:
+    """
+    Incremental extractor for one top-level string field of a JSON object
+    that arrives in arbitrary chunks (e.g. streamed completion deltas).
+
+        stream = JsonFieldStream("content")
+        for delta in deltas:
+            print(stream.feed(delta), end="")
+
+    `feed` returns the newly decoded characters of the field's value, so the
+    caller can show them before the JSON document is complete.
+    """
+
+    ESCAPES = {'"': '"', "\\": "\\", "/": "/", "b": "\b", "f": "\f", "n": "\n", "r": "\r", "t": "\t"}
+
+    def __init__(self, field: str):
+        self.field = field
+        self.depth = 0
+        self.in_string = False
+        self.escape = None  # None, "" after a backslash, or collected \u hex digits
+        self.high_surrogate = None
+        self.expect_key = False
+        self.key = []
+        self.last_key = None
+        self.string_is_key = False
+        self.capturing = False
+        self.done = False
+
+    def _decoded(self, ch):
+        """Feed one char of an escape sequence. Returns the decoded text, if complete."""
+        if self.escape == "":
+            if ch == "u":
+                self.escape = "u"
+                return None
+            self.escape = None
+            return self.ESCAPES.get(ch, ch)
+
+        self.escape += ch
+        if len(self.escape) < 5:  # "u" + 4 hex digits
+            return None
+
+        code = int(self.escape[1:], 16)
+        self.escape = None
+        if 0xD800 <= code < 0xDC00:
+            self.high_surrogate = code
+            return None
+        if 0xDC00 <= code < 0xE000 and self.high_surrogate is not None:
+            code = 0x10000 + ((self.high_surrogate - 0xD800) << 10) + (code - 0xDC00)
+        self.high_surrogate = None
+        return chr(code)
+
+    def feed(self, text: str) -> str:
+        out = []
+        for ch in text:
+            if self.in_string:
+                if self.escape is not None:
+                    decoded = self._decoded(ch)
+                elif ch == "\\":
+                    self.escape = ""
+                    continue
+                elif ch == '"':
+                    self.in_string = False
+                    if self.string_is_key:
+                        self.last_key = "".join(self.key)
+                    elif self.capturing:
+                        self.capturing = False
+                        self.done = True
+                    continue
+                else:
+                    decoded = ch
+
+                if decoded is None:
+                    continue
+                if self.string_is_key:
+                    self.key.append(decoded)
+                elif self.capturing:
+                    out.append(decoded)
+                continue
+
+            if ch == '"':
+                self.in_string = True
+                self.string_is_key = self.depth == 1 and self.expect_key
+                if self.string_is_key:
+                    self.key = []
+                else:
+                    self.capturing = (
+                        self.depth == 1 and not self.done and self.last_key == self.field
+                    )
+            elif ch in "{[":
+                self.depth += 1
+                self.expect_key = ch == "{" and self.depth == 1
+            elif ch in "}]":
+                self.depth -= 1
+            elif ch == ":" and self.depth == 1:
+                self.expect_key = False
+            elif ch == "," and self.depth == 1:
+                self.expect_key = True
+                self.last_key = None
+
+        return "".join(out)
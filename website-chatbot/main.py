@@ -1,14 +1,21 @@
+import asyncio
+import hashlib
 import os
 import time
+import uuid
 import json
+from functools import lru_cache
 from typing import List
 from dotenv import load_dotenv
-from langchain_community.document_loaders import SitemapLoader
 from langchain_text_splitters import RecursiveCharacterTextSplitter
 from langchain_openai import OpenAIEmbeddings
 from langchain_qdrant import QdrantVectorStore
 from qdrant_client import QdrantClient
+from qdrant_client.http import models
 from openai import OpenAI
+from crawler import crawl, load_manifest, save_manifest
+from json_stream import JsonFieldStream
+from rate_limit import call_with_rate_limit, count_tokens, embedding_rate_limiter
 
 
 def init_clients():
@@ -26,6 +33,99 @@ def init_clients():
     return client, embeddings
 
 
+@lru_cache(maxsize=None)
+def get_qdrant_client(qdrant_url="http://localhost:6333", prefer_grpc=True):
+    return QdrantClient(url=qdrant_url, prefer_grpc=prefer_grpc)
+
+
+CHUNK_NAMESPACE = uuid.UUID("6f1d3c1e-2b7a-4c55-9a0e-3f5b8d2c7e41")
+
+
+def chunk_id(doc) -> str:
+    # same (source, offset, content) -> same point id, so re-ingesting upserts
+    # in place instead of adding duplicates
+    content_hash = hashlib.sha256(doc.page_content.encode("utf-8")).hexdigest()
+    doc.metadata["content_hash"] = content_hash
+    key = f"{doc.metadata.get('source')}|{doc.metadata.get('start_index')}|{content_hash}"
+    return str(uuid.uuid5(CHUNK_NAMESPACE, key))
+
+
+_retrievers = {}
+
+
+def get_retriever(embeddings, collection_name: str, qdrant_url="http://localhost:6333"):
+    # built once per collection, so the chat loop reuses the warm connection.
+    # keyed by id() because the embeddings model isn't hashable
+    key = (qdrant_url, collection_name, id(embeddings))
+    if key not in _retrievers:
+        _retrievers[key] = QdrantVectorStore(
+            client=get_qdrant_client(qdrant_url),
+            collection_name=collection_name,
+            embedding=embeddings,
+        )
+    return _retrievers[key]
+
+
+def delete_source(qdrant, collection_name: str, source: str):
+    qdrant.delete(
+        collection_name=collection_name,
+        points_selector=models.FilterSelector(
+            filter=models.Filter(
+                must=[
+                    models.FieldCondition(
+                        key="metadata.source", match=models.MatchValue(value=source)
+                    )
+                ]
+            )
+        ),
+    )
+
+
+def ensure_collection(qdrant, collection_name: str, embeddings):
+    # same layout QdrantVectorStore.from_documents would create, without the
+    # throwaway store; the probe embedding is only paid when it's missing
+    if qdrant.collection_exists(collection_name):
+        return
+    qdrant.create_collection(
+        collection_name=collection_name,
+        vectors_config=models.VectorParams(
+            size=len(embeddings.embed_query("dummy_text")),
+            distance=models.Distance.COSINE,
+        ),
+    )
+
+
+def ensure_source_index(qdrant, collection_name: str):
+    # keyword index so source filters, deletes and facets don't scan payloads
+    qdrant.create_payload_index(
+        collection_name=collection_name,
+        field_name="metadata.source",
+        field_schema=models.PayloadSchemaType.KEYWORD,
+    )
+
+
+def indexed_sources(qdrant, collection_name: str, sources, batch_size=256) -> set:
+    """Which of `sources` already have points, asked in batches via facets."""
+    found = set()
+    for i in range(0, len(sources), batch_size):
+        batch = sources[i : i + batch_size]
+        response = qdrant.facet(
+            collection_name=collection_name,
+            key="metadata.source",
+            facet_filter=models.Filter(
+                must=[
+                    models.FieldCondition(
+                        key="metadata.source", match=models.MatchAny(any=batch)
+                    )
+                ]
+            ),
+            limit=len(batch),
+            exact=True,
+        )
+        found.update(hit.value for hit in response.hits)
+    return found
+
+
 def ingest_site(
     sitemap_url: str,
     collection_name: str,
@@ -34,14 +134,9 @@ def ingest_site(
 ):
     print(" Starting ingestion pipeline...")
 
-    qdrant = QdrantClient(url=qdrant_url)
+    qdrant = get_qdrant_client(qdrant_url)
 
-    vector_store = QdrantVectorStore.from_documents(
-        documents=[],
-        embedding=embeddings,
-        url="http://localhost:6333", 
-        collection_name=collection_name,
-    )
+    ensure_collection(qdrant, collection_name, embeddings)
 
     # vector_store = QdrantVectorStore(
     #     client=qdrant,
@@ -49,43 +144,90 @@ def ingest_site(
     #     embedding=embeddings,
     # )
 
+    ensure_source_index(qdrant, collection_name)
+
     
-    print(f"Fetching sitemap: {sitemap_url}")
-    loader = SitemapLoader(sitemap_url)
-    docs = loader.load()
-    print(f"Total pages found: {len(docs)}")
-
-    # Check existing sources
-    existing_points, _ = qdrant.scroll(
-        collection_name=collection_name, limit=10000, with_payload=True
+    print(f"Crawling sitemap: {sitemap_url}")
+    manifest = load_manifest(collection_name)
+    crawl_result = asyncio.run(crawl(sitemap_url, manifest))
+    print(
+        f"Changed: {len(crawl_result.changed)}, "
+        f"unchanged: {len(crawl_result.unchanged)}, "
+        f"removed: {len(crawl_result.removed)}"
     )
-    existing_sources = {p.payload.get("source") for p in existing_points}
-    print(f"Already indexed: {len(existing_sources)} pages")
 
-    # Filter new docs
-    new_docs = [
-        doc for doc in docs if doc.metadata.get("source") not in existing_sources
+    for url in crawl_result.removed:
+        delete_source(qdrant, collection_name, url)
+        manifest.pop(url, None)
+
+    # Pages the manifest has never seen may still be indexed from an older run
+    unknown = [
+        doc.metadata["source"]
+        for doc in crawl_result.changed
+        if doc.metadata["source"] not in manifest
     ]
+    existing_sources = indexed_sources(qdrant, collection_name, unknown)
+    print(f"Already indexed: {len(existing_sources)} pages")
+
+    new_docs = []
+    for doc in crawl_result.changed:
+        source = doc.metadata["source"]
+        if source in manifest or source not in existing_sources:
+            new_docs.append(doc)
+        else:
+            manifest[source] = crawl_result.changed_entries[source]
     print(f"New pages to index: {len(new_docs)}")
 
+    manifest.update(crawl_result.unchanged)
     if not new_docs:
+        save_manifest(collection_name, manifest)
         print("✅ No new pages. Ingestion skipped.")
         return
 
    
-    text_splitter = RecursiveCharacterTextSplitter(chunk_size=1000, chunk_overlap=200)
+    text_splitter = RecursiveCharacterTextSplitter(
+        chunk_size=1000, chunk_overlap=200, add_start_index=True
+    )
     BATCH_SIZE = 100
-    LIMIT = 500
-    subset = new_docs[:LIMIT]
+    limiter = embedding_rate_limiter()
 
-    for i in range(0, len(subset), BATCH_SIZE):
-        batch = subset[i : i + BATCH_SIZE]
+    for i in range(0, len(new_docs), BATCH_SIZE):
+        batch = new_docs[i : i + BATCH_SIZE]
         print(f"\nProcessing batch {i//BATCH_SIZE + 1} ({i} → {i+len(batch)})")
 
-        split_batch = text_splitter.split_documents(batch)
-        vector_store.add_documents(split_batch)
+        # a changed page gets fresh chunks, drop the old ones first
+        for doc in batch:
+            if doc.metadata["source"] in manifest:
+                delete_source(qdrant, collection_name, doc.metadata["source"])
 
-        time.sleep(2)  # avoid hitting rate limits
+        split_batch = text_splitter.split_documents(batch)
+        texts = [doc.page_content for doc in split_batch]
+
+        # OpenAIEmbeddings sends at most `chunk_size` inputs per request
+        requests = -(-len(texts) // embeddings.chunk_size)
+        vectors = call_with_rate_limit(
+            limiter,
+            count_tokens(texts),
+            lambda: embeddings.embed_documents(texts),
+            requests=requests,
+        )
+
+        qdrant.upsert(
+            collection_name=collection_name,
+            points=[
+                models.PointStruct(
+                    id=chunk_id(doc),
+                    vector=vector,
+                    payload={"page_content": doc.page_content, "metadata": doc.metadata},
+                )
+                for doc, vector in zip(split_batch, vectors)
+            ],
+        )
+
+        for doc in batch:
+            source = doc.metadata["source"]
+            manifest[source] = crawl_result.changed_entries[source]
+        save_manifest(collection_name, manifest)
 
     print(" Ingestion complete!")
 
@@ -113,45 +255,59 @@ def retrieve_docs(
     qdrant_url="http://localhost:6333",
     top_k=5,
 ):
-    retriever = QdrantVectorStore.from_existing_collection(
-        url=qdrant_url,
-        collection_name=collection_name,
-        embedding=embeddings,
-    )
+    retriever = get_retriever(embeddings, collection_name, qdrant_url)
     return retriever.similarity_search(query=query, k=top_k)
 
 
-def get_answer(client, user_query: str, relevant_chunks) -> dict:
-   
+# Static and first in the prompt; the retrieved context and question come
+# after it. It is far below the 1024-token caching minimum on its own, so
+# only a repeated question with the same chunks reports cached tokens.
+ANSWER_INSTRUCTIONS = """
+You are an expert AI assistant. Base all answers only on the provided Context.
+
+Return a single JSON object (no extra text) using this schema:
+{
+  "stage": "analyse" | "considerations" | "validation" | "result" | "output",
+  "content": "string (concise, user-facing; max 150 words)",
+  "sources": ["optional short references to the provided context"],
+  "status": "final" | "continue"
+}
+
+Rules:
+- If the answer is not in context, return: {"status":"final","content":"I don’t know bruv"}.
+"""
+
+
+def build_answer_messages(user_query: str, relevant_chunks) -> list:
     context = "\n\n".join([doc.page_content for doc in relevant_chunks])
 
-    SYSTEM_PROMPT = f"""
-    You are an expert AI assistant. Base all answers only on the provided Context.
+    return [
+        {"role": "system", "content": ANSWER_INSTRUCTIONS},
+        {"role": "system", "content": f"Context:\n{context}"},
+        {"role": "user", "content": user_query},
+    ]
 
-    Return a single JSON object (no extra text) using this schema:
-    {{
-      "stage": "analyse" | "considerations" | "validation" | "result" | "output",
-      "content": "string (concise, user-facing; max 150 words)",
-      "sources": ["optional short references to the provided context"],
-      "status": "final" | "continue"
-    }}
 
-    Rules:
-    - If the answer is not in context, return: {{"status":"final","content":"I don’t know bruv"}}.
-    - Context is below:
+def report_cache_usage(usage) -> None:
+    """Cached vs uncached prompt tokens (OpenAI caches 1024+ token prefixes)."""
+    if usage is None:
+        return
+    details = usage.prompt_tokens_details
+    cached = (details.cached_tokens or 0) if details else 0
+    note = " (below the 1024-token cache minimum)" if usage.prompt_tokens < 1024 else ""
+    print(
+        f"🧾 {usage.prompt_tokens} prompt tokens, {cached} cached, "
+        f"{usage.prompt_tokens - cached} uncached{note}"
+    )
 
-    Context:
-    {context}
-    """
 
+def get_answer(client, user_query: str, relevant_chunks) -> dict:
     resp = client.chat.completions.create(
         model="gpt-4o-mini",
-        messages=[
-            {"role": "system", "content": SYSTEM_PROMPT},
-            {"role": "user", "content": user_query},
-        ],
+        messages=build_answer_messages(user_query, relevant_chunks),
         temperature=0.2,
     )
+    report_cache_usage(resp.usage)
 
     try:
         parsed = json.loads(resp.choices[0].message.content)
@@ -161,6 +317,58 @@ def get_answer(client, user_query: str, relevant_chunks) -> dict:
     return parsed
 
 
+def stream_answer(client, user_query: str, relevant_chunks, on_token=None) -> dict:
+    """
+    Same answer as get_answer, but the `content` field is handed to
+    `on_token` (printed by default) as soon as its characters arrive.
+    """
+    if on_token is None:
+        on_token = lambda text: print(text, end="", flush=True)
+
+    started = time.perf_counter()
+    first_token_at = None
+    content_stream = JsonFieldStream("content")
+    raw = []
+
+    stream = client.chat.completions.create(
+        model="gpt-4o-mini",
+        messages=build_answer_messages(user_query, relevant_chunks),
+        temperature=0.2,
+        response_format={"type": "json_object"},
+        stream=True,
+        stream_options={"include_usage": True},
+    )
+
+    usage = None
+    for chunk in stream:
+        if chunk.usage is not None:
+            usage = chunk.usage  # sent on the final, choice-less chunk
+        if not chunk.choices:
+            continue
+        delta = chunk.choices[0].delta.content
+        if not delta:
+            continue
+
+        raw.append(delta)
+        text = content_stream.feed(delta)
+        if text:
+            if first_token_at is None:
+                first_token_at = time.perf_counter() - started
+            on_token(text)
+
+    total = time.perf_counter() - started
+    if first_token_at is not None:
+        print(f"\n⏱️ first token {first_token_at * 1000:.0f} ms, total {total * 1000:.0f} ms")
+    report_cache_usage(usage)
+
+    try:
+        parsed = json.loads("".join(raw))
+    except json.JSONDecodeError:
+        parsed = {"status": "final", "content": "⚠️ Invalid JSON returned"}
+
+    return parsed
+
+
 def main():
     client, embeddings = init_clients()
 
@@ -181,9 +389,10 @@ def main():
         print(f"🔄 Rewritten query: {rewritten}")
 
         chunks = retrieve_docs(rewritten, embeddings, collection_name="site")
-        answer = get_answer(client, user_query, chunks)
+        print("🤖 Answer: ", end="")
+        answer = stream_answer(client, user_query, chunks)
 
-        print(f"🤖 Answer: {json.dumps(answer, indent=2)}")
+        print(f"Sources: {answer.get('sources', [])}")
 
 
 if __name__ == "__main__":
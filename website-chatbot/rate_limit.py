@@ -0,0 +1,109 @@
+import os
+import random
+import threading
+import time
+import openai
+import tiktoken
+
+
+class TokenBucket:
+    """Classic token bucket: `capacity` units, refilled continuously per minute."""
+
+    def __init__(self, per_minute: float):
+        self.capacity = per_minute
+        self.rate = per_minute / 60.0
+        self.available = per_minute
+        self.updated = time.monotonic()
+
+    def _refill(self):
+        now = time.monotonic()
+        self.available = min(
+            self.capacity, self.available + (now - self.updated) * self.rate
+        )
+        self.updated = now
+
+    def wait_time(self, amount: float) -> float:
+        self._refill()
+        if amount <= self.available:
+            return 0.0
+        return (amount - self.available) / self.rate
+
+    def take(self, amount: float):
+        self.available -= amount
+
+
+class RateLimiter:
+    """
+    Requests-per-minute + tokens-per-minute budget for an OpenAI endpoint.
+    `acquire` blocks only as long as the budget requires, and a 429 pauses
+    every caller until the server's retry-after has passed.
+    """
+
+    def __init__(self, rpm: float, tpm: float):
+        self.requests = TokenBucket(rpm)
+        self.tokens = TokenBucket(tpm)
+        self.paused_until = 0.0
+        self.lock = threading.Lock()
+
+    def acquire(self, tokens: int, requests: int = 1):
+        tokens = min(tokens, self.tokens.capacity)
+        while True:
+            with self.lock:
+                wait = max(
+                    self.paused_until - time.monotonic(),
+                    self.requests.wait_time(requests),
+                    self.tokens.wait_time(tokens),
+                )
+                if wait <= 0:
+                    self.requests.take(requests)
+                    self.tokens.take(tokens)
+                    return
+            time.sleep(wait)
+
+    def pause(self, seconds: float):
+        with self.lock:
+            self.paused_until = max(self.paused_until, time.monotonic() + seconds)
+
+
+def embedding_rate_limiter() -> RateLimiter:
+    # defaults are the tier-1 limits for text-embedding-3-large
+    return RateLimiter(
+        rpm=float(os.getenv("EMBEDDING_RPM", 3000)),
+        tpm=float(os.getenv("EMBEDDING_TPM", 1_000_000)),
+    )
+
+
+_encoding = None
+
+
+def count_tokens(texts) -> int:
+    global _encoding
+    if _encoding is None:
+        # text-embedding-3-* use the cl100k_base tokenizer
+        _encoding = tiktoken.get_encoding("cl100k_base")
+    return sum(len(tokens) for tokens in _encoding.encode_batch(list(texts)))
+
+
+def retry_after(error: openai.RateLimitError, attempt: int) -> float:
+    headers = getattr(error.response, "headers", None) or {}
+    if headers.get("retry-after-ms"):
+        return float(headers["retry-after-ms"]) / 1000
+    if headers.get("retry-after"):
+        try:
+            return float(headers["retry-after"])
+        except ValueError:
+            pass
+    return min(60.0, 2**attempt) + random.random()
+
+
+def call_with_rate_limit(limiter: RateLimiter, tokens: int, fn, requests=1, max_retries=6):
+    for attempt in range(max_retries + 1):
+        limiter.acquire(tokens, requests)
+        try:
+            return fn()
+        except openai.RateLimitError as e:
+            if attempt == max_retries:
+                raise
+            wait = retry_after(e, attempt)
+            print(f"⚠️ Rate limited, retrying in {wait:.1f}s")
+            limiter.pause(wait)